@@ -0,0 +1,26 @@
+"""Reels checksum
+
+Revision ID: 0a6e4c2b8f71
+Revises: f3c8d1a6b925
+Create Date: 2026-10-18 19:03:15.662480
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a6e4c2b8f71'
+down_revision: Union[str, None] = 'f3c8d1a6b925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video_reels', sa.Column('checksum', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('video_reels', 'checksum')
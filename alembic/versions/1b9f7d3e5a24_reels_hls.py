@@ -0,0 +1,30 @@
+"""Reels HLS packaging state
+
+Revision ID: 1b9f7d3e5a24
+Revises: 0a6e4c2b8f71
+Create Date: 2026-10-18 20:26:40.318957
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b9f7d3e5a24'
+down_revision: Union[str, None] = '0a6e4c2b8f71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video_reels', sa.Column('hls_status', sa.String(length=16), nullable=True))
+    op.add_column('video_reels', sa.Column('hls_playlist', sa.String(), nullable=True))
+    # Уже загруженные рилсы ставим в очередь, их подберёт resume_reels_processing
+    op.execute("UPDATE video_reels SET hls_status = 'pending'")
+
+
+def downgrade() -> None:
+    op.drop_column('video_reels', 'hls_playlist')
+    op.drop_column('video_reels', 'hls_status')
@@ -0,0 +1,26 @@
+"""Reels processing start time
+
+Revision ID: 3c8e1d6f2a57
+Revises: 9e5f2b7c1a30
+Create Date: 2026-10-18 22:41:37.215904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e1d6f2a57'
+down_revision: Union[str, None] = '9e5f2b7c1a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video_reels', sa.Column('hls_started_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('video_reels', 'hls_started_at')
@@ -0,0 +1,26 @@
+"""Content feed keyset index
+
+Revision ID: 3f9a1c2d7b40
+Revises: e116b748397a
+Create Date: 2026-10-18 10:12:04.318245
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c2d7b40'
+down_revision: Union[str, None] = 'e116b748397a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_content_created_at_id', 'content', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_content_created_at_id', table_name='content')
@@ -0,0 +1,48 @@
+"""Unique views per user and target
+
+Revision ID: 5b7d0e3f9c12
+Revises: 8c4e2a91d6f3
+Create Date: 2026-10-18 12:41:19.530871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7d0e3f9c12'
+down_revision: Union[str, None] = '8c4e2a91d6f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+VIEW_TARGETS = (
+    ('uq_views_user_content', 'content_id', 'content', 'view_count'),
+    ('uq_views_user_reels', 'reels_id', 'video_reels', 'view_count'),
+    ('uq_views_user_history', 'history_id', 'history', 'views_count'),
+)
+
+
+def upgrade() -> None:
+    for index_name, column, table, counter in VIEW_TARGETS:
+        op.execute(f"""
+            DELETE FROM views a USING views b
+            WHERE a.id > b.id AND a.user_id = b.user_id AND a.{column} = b.{column}
+        """)
+
+        op.create_index(
+            index_name, 'views', ['user_id', column], unique=True,
+            postgresql_where=sa.text(f'{column} IS NOT NULL'),
+        )
+
+        op.execute(f"""
+            UPDATE {table} SET
+                {counter} = (SELECT count(*) FROM views WHERE views.{column} = {table}.id)
+        """)
+
+
+def downgrade() -> None:
+    for index_name, _, _, _ in VIEW_TARGETS:
+        op.drop_index(index_name, table_name='views')
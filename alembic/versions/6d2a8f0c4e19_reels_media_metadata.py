@@ -0,0 +1,32 @@
+"""Reels poster and media metadata
+
+Revision ID: 6d2a8f0c4e19
+Revises: 1b9f7d3e5a24
+Create Date: 2026-10-18 21:04:12.508113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d2a8f0c4e19'
+down_revision: Union[str, None] = '1b9f7d3e5a24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('video_reels', sa.Column('poster', sa.String(), nullable=True))
+    op.add_column('video_reels', sa.Column('duration', sa.Float(), nullable=True))
+    op.add_column('video_reels', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('video_reels', sa.Column('height', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('video_reels', 'height')
+    op.drop_column('video_reels', 'width')
+    op.drop_column('video_reels', 'duration')
+    op.drop_column('video_reels', 'poster')
@@ -0,0 +1,47 @@
+"""Engagement counters on content and video_reels
+
+Revision ID: 8c4e2a91d6f3
+Revises: 3f9a1c2d7b40
+Create Date: 2026-10-18 11:03:47.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4e2a91d6f3'
+down_revision: Union[str, None] = '3f9a1c2d7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COUNTERS = ('like_count', 'comment_count', 'share_count')
+
+
+def upgrade() -> None:
+    for table in ('content', 'video_reels'):
+        for column in COUNTERS:
+            op.add_column(table, sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+
+    op.execute("""
+        UPDATE content SET
+            like_count = (SELECT count(*) FROM content_likes WHERE content_likes.content_id = content.id),
+            comment_count = (SELECT count(*) FROM commentarion_model WHERE commentarion_model.content_id = content.id),
+            share_count = (SELECT count(*) FROM user_content WHERE user_content.content_id = content.id)
+    """)
+
+    op.execute("""
+        UPDATE video_reels SET
+            like_count = (SELECT count(*) FROM video_reels_likes WHERE video_reels_likes.reels_id = video_reels.id),
+            comment_count = (SELECT count(*) FROM commentarion_model WHERE commentarion_model.reels_id = video_reels.id),
+            share_count = (SELECT count(*) FROM user_content WHERE user_content.reels_id = video_reels.id)
+    """)
+
+
+def downgrade() -> None:
+    for table in ('content', 'video_reels'):
+        for column in COUNTERS:
+            op.drop_column(table, column)
@@ -0,0 +1,33 @@
+"""Content-addressed media objects
+
+Revision ID: 9e5f2b7c1a30
+Revises: 6d2a8f0c4e19
+Create Date: 2026-10-18 22:15:37.902416
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e5f2b7c1a30'
+down_revision: Union[str, None] = '6d2a8f0c4e19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'media_objects',
+        sa.Column('kind', sa.String(length=16), primary_key=True),
+        sa.Column('key', sa.String(), primary_key=True),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), server_default='1', nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('media_objects')
@@ -0,0 +1,26 @@
+"""Chat message keyset index
+
+Revision ID: a4d19e6b2c57
+Revises: 5b7d0e3f9c12
+Create Date: 2026-10-18 14:05:52.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d19e6b2c57'
+down_revision: Union[str, None] = '5b7d0e3f9c12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_messages_chat_id_timestamp_id', 'messages', ['chat_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_chat_id_timestamp_id', table_name='messages')
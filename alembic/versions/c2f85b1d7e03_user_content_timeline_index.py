@@ -0,0 +1,26 @@
+"""Chat share timeline index
+
+Revision ID: c2f85b1d7e03
+Revises: a4d19e6b2c57
+Create Date: 2026-10-18 15:22:37.640913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f85b1d7e03'
+down_revision: Union[str, None] = 'a4d19e6b2c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_user_content_chat_id_created_at_id', 'user_content', ['chat_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_content_chat_id_created_at_id', table_name='user_content')
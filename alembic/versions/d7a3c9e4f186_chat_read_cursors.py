@@ -0,0 +1,48 @@
+"""Chat read cursors
+
+Revision ID: d7a3c9e4f186
+Revises: c2f85b1d7e03
+Create Date: 2026-10-18 16:48:03.275519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3c9e4f186'
+down_revision: Union[str, None] = 'c2f85b1d7e03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'chat_read_cursors',
+        sa.Column('chat_id', sa.Integer(), sa.ForeignKey('chats.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('last_read_at', sa.DateTime(), nullable=True),
+        sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False),
+    )
+
+    # Until now a user's own last message was the only sign of having read a chat.
+    op.execute("""
+        INSERT INTO chat_read_cursors (chat_id, user_id, last_read_at, unread_count)
+        SELECT p.chat_id, p.user_id, last_sent.timestamp, (
+            SELECT count(*) FROM messages m
+            WHERE m.chat_id = p.chat_id
+              AND m.author_id <> p.user_id
+              AND (last_sent.timestamp IS NULL OR m.timestamp > last_sent.timestamp)
+        )
+        FROM (SELECT DISTINCT chat_id, user_id FROM chat_participants WHERE chat_id IS NOT NULL) p
+        LEFT JOIN LATERAL (
+            SELECT max(timestamp) AS timestamp FROM messages
+            WHERE messages.chat_id = p.chat_id AND messages.author_id = p.user_id
+        ) last_sent ON true
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('chat_read_cursors')
@@ -0,0 +1,45 @@
+"""Chat participant-set hash
+
+Revision ID: e91b6f2a4d58
+Revises: d7a3c9e4f186
+Create Date: 2026-10-18 17:31:26.804137
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e91b6f2a4d58'
+down_revision: Union[str, None] = 'd7a3c9e4f186'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chats', sa.Column('participants_hash', sa.String(length=64), nullable=True))
+
+    # Same canonical form as chat_service.participants_hash: sorted distinct ids joined by ",".
+    # When several chats share a participant set only the oldest one gets the hash.
+    op.execute("""
+        WITH sets AS (
+            SELECT chat_id, encode(sha256(string_agg(user_id::text, ',' ORDER BY user_id)::bytea), 'hex') AS hash
+            FROM (SELECT DISTINCT chat_id, user_id FROM chat_participants WHERE chat_id IS NOT NULL) p
+            GROUP BY chat_id
+        ), ranked AS (
+            SELECT chat_id, hash, row_number() OVER (PARTITION BY hash ORDER BY chat_id) AS position
+            FROM sets
+        )
+        UPDATE chats SET participants_hash = ranked.hash
+        FROM ranked
+        WHERE chats.id = ranked.chat_id AND ranked.position = 1
+    """)
+
+    op.create_index('ix_chats_participants_hash', 'chats', ['participants_hash'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chats_participants_hash', table_name='chats')
+    op.drop_column('chats', 'participants_hash')
@@ -0,0 +1,31 @@
+"""Unique chat participants
+
+Revision ID: f3c8d1a6b925
+Revises: e91b6f2a4d58
+Create Date: 2026-10-18 18:12:44.091762
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8d1a6b925'
+down_revision: Union[str, None] = 'e91b6f2a4d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        DELETE FROM chat_participants a USING chat_participants b
+        WHERE a.id > b.id AND a.chat_id = b.chat_id AND a.user_id = b.user_id
+    """)
+
+    op.create_index('uq_chat_participants_chat_id_user_id', 'chat_participants', ['chat_id', 'user_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_chat_participants_chat_id_user_id', table_name='chat_participants')
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from database import models, database
 from services.api.v1.authentication_services import AuthenticationService
@@ -13,7 +13,7 @@ router = APIRouter(
 @router.post("/login")
 async def login(
     request: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
 ):
     
     services = AuthenticationService(session=session)
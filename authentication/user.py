@@ -1,26 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Query, Request
 from database import schema, database, models
 from .oauth import get_current_user
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import mimetypes
 import os
 from services.api.v1.user_service import UserService
-from typing import List
+from services.api.v1.image_variants import pick_variant
+from services.api.v1.media_store import image_store, is_hashed
+from services.api.v1.media_delivery import IMMUTABLE_CACHE_CONTROL, media_file_response
+from typing import List, Literal, Optional
 
 
 router = APIRouter(tags=["User"])
 
 
-IMAGEDIR = "media/images/"
-
-
 @router.post("/sign_up/")
 async def create_new_user(
     username: str = Form(...),
     password: str = Form(...),
     email: str = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 ):
 
     service = UserService(session=db)
@@ -35,7 +35,7 @@ async def get_user(
     category: schema.InteresingContentEnum,
     user_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 
 ):
     serivice = UserService(session=db)
@@ -44,16 +44,36 @@ async def get_user(
 
 
 @router.get("/file/{filename}")
-async def get_profile_photo(filename: str):
-    file_path = os.path.join(IMAGEDIR, filename)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path)
+async def get_profile_photo(
+    request: Request,
+    filename: str,
+    size: Optional[int] = Query(None, gt=0),
+    format: Literal["jpeg", "webp"] = "jpeg",
+):
+    served = filename
+
+    # Если миниатюры нет (маленький оригинал или старый файл), отдаём оригинал
+    variant = pick_variant(filename, size, format)
+    if variant is not None and await image_store.exists(variant):
+        served = variant
+
+    if image_store.path(served) is None:
+        return image_store.redirect(served)
+
+    # Имена файлов не меняют содержимое, поэтому ответ можно кешировать навсегда
+    return await media_file_response(
+        request,
+        image_store.path(served),
+        media_type=mimetypes.guess_type(served)[0],
+        etag=f'"{os.path.splitext(served)[0]}"' if is_hashed(served) else None,
+        cache_control=IMMUTABLE_CACHE_CONTROL,
+        cached_stat=True,
+    )
 
 
 @router.patch("/update-user-components/", response_model=schema.UserUpdateResponse)
 async def update_username(
-    db: Session = Depends(database.get_db), 
+    db: AsyncSession = Depends(database.get_db), 
     current_user: models.User = Depends(get_current_user),
     username: str = Form(...),
     surname: str = Form(None),
@@ -79,7 +99,7 @@ async def update_username(
 async def follow_user(
     user_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 ):
 
     service = UserService(session=db)
@@ -89,7 +109,7 @@ async def follow_user(
 @router.post("/unfollow/{id}")
 async def unfollow(
     id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -102,7 +122,7 @@ async def unfollow(
 @router.get("/subscriptions/content", response_model=List[schema.ContentSchema])
 async def get_subscribed_content(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 ):
 
     service = UserService(session=db)
@@ -117,7 +137,7 @@ async def get_subscribed_content(
 async def get_following_users(
     user_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 ):
 
     service = UserService(session=db)
@@ -130,7 +150,7 @@ async def get_following_users(
 async def get_followers_users(
     user_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 ):
 
     service = UserService(session=db)
@@ -140,7 +160,7 @@ async def get_followers_users(
 
 @router.get("/get-user-chosen", response_model=List[schema.ContentSchema])
 async def get_user_liked_contents(
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     service = UserService(session=db)
@@ -151,7 +171,7 @@ async def get_user_liked_contents(
 @router.get("/search-users/", response_model=List[schema.UserShema])
 async def search_users(
     username: str = None,
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ) -> List[schema.UserShema]:
 
@@ -161,7 +181,7 @@ async def search_users(
 
 @router.get("/user-me/", response_model=schema.UserShemaForContent)
 async def user_me(
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -172,7 +192,7 @@ async def user_me(
 @router.get("/subscriptions/history", response_model=List[schema.HistoryResponse])
 async def get_subscribed_history(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 ):
 
     serivece = UserService(session=db)
@@ -181,7 +201,7 @@ async def get_subscribed_history(
 
 @router.patch("/close-user-account/")
 async def close_user_account(
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     serivece = UserService(session=session)
@@ -190,7 +210,7 @@ async def close_user_account(
 
 @router.patch("/update-password/")
 async def update_password(
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
     old_password: str = Form(...),
     new_password: str = Form(...),
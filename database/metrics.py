@@ -0,0 +1,50 @@
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import time
+
+
+POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the pool",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+POOL_CONNECTIONS_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Connections currently checked out of the pool"
+)
+POOL_OVERFLOW_TOTAL = Counter(
+    "db_pool_overflow_total", "Connections opened beyond pool_size"
+)
+POOL_TIMEOUTS_TOTAL = Counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after pool_timeout"
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS_TOTAL.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
+
+def instrument_pool(pool: InstrumentedQueuePool):
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        if pool.overflow() > 0:
+            POOL_OVERFLOW_TOTAL.inc()
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CONNECTIONS_IN_USE.set(pool.checkedout())
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        POOL_CONNECTIONS_IN_USE.set(pool.checkedout())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, func, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, func, Boolean, Index, text, Float, BigInteger
 from sqlalchemy.orm import relationship,  mapped_column, Mapped
 from datetime import datetime, timedelta
 from .database import Base
@@ -54,6 +54,7 @@ class Chat(Base):
     messages: Mapped[list["Message"]] = relationship("Message", back_populates="chat")
     author: Mapped["User"] = relationship('User', back_populates='chat_author')
     author_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=True)
+    participants_hash: Mapped[str] = mapped_column(String(64), index=True, unique=True, nullable=True)
     # chat_name: Mapped[str] = mapped_column(String, nullable=True)
 
     user_content: Mapped[list["Content"]] = relationship(
@@ -82,6 +83,9 @@ class Chat(Base):
 
 class UserContent(Base):
     __tablename__ = 'user_content'
+    __table_args__ = (
+        Index('ix_user_content_chat_id_created_at_id', 'chat_id', 'created_at', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     sender_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
@@ -161,6 +165,9 @@ class User(Base):
 
 class ChatParticipant(Base):
     __tablename__ = 'chat_participants'
+    __table_args__ = (
+        Index('uq_chat_participants_chat_id_user_id', 'chat_id', 'user_id', unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     chat_id: Mapped[int] = mapped_column(Integer, ForeignKey('chats.id'), nullable=True)
@@ -169,15 +176,27 @@ class ChatParticipant(Base):
     chat: Mapped["Chat"] = relationship("Chat", back_populates="participants")
     user: Mapped["User"] = relationship("User", back_populates="chat_participants")
 
+class ChatReadCursor(Base):
+    __tablename__ = 'chat_read_cursors'
+
+    chat_id: Mapped[int] = mapped_column(Integer, ForeignKey('chats.id', ondelete='CASCADE'), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    last_read_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    unread_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+
+
 class Message(Base):
     __tablename__ = 'messages'
+    __table_args__ = (
+        Index('ix_messages_chat_id_timestamp_id', 'chat_id', 'timestamp', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     message: Mapped[str] = mapped_column(String)
     img_file: Mapped[str] = mapped_column(String, nullable=True)
     author_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'))
     chat_id: Mapped[int] = mapped_column(Integer, ForeignKey('chats.id'), nullable=True)
-    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow())
+    timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     author: Mapped["User"] = relationship("User", back_populates="messages")
     chat: Mapped["Chat"] = relationship("Chat", back_populates="messages")
@@ -186,6 +205,9 @@ class Message(Base):
 
 class Content(Base):
     __tablename__ = 'content'
+    __table_args__ = (
+        Index('ix_content_created_at_id', 'created_at', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, index=True, primary_key=True)
     content_title: Mapped[str] = mapped_column(String, nullable=False)
@@ -207,6 +229,9 @@ class Content(Base):
     views: Mapped[list["View"]] = relationship("View", back_populates="content", cascade="all, delete-orphan")
     
     view_count: Mapped[int] = mapped_column(Integer, default=0)
+    like_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    comment_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    share_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
     user_chosen: Mapped[list["User"]] = relationship('User', secondary=chosen, back_populates='user_chosen')
     content_for : Mapped[str] = mapped_column(String, nullable=False)
 
@@ -255,6 +280,11 @@ class CommentarionModel(Base):
 
 class View(Base):
     __tablename__ = 'views'
+    __table_args__ = (
+        Index('uq_views_user_content', 'user_id', 'content_id', unique=True, postgresql_where=text('content_id IS NOT NULL')),
+        Index('uq_views_user_reels', 'user_id', 'reels_id', unique=True, postgresql_where=text('reels_id IS NOT NULL')),
+        Index('uq_views_user_history', 'user_id', 'history_id', unique=True, postgresql_where=text('history_id IS NOT NULL')),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     content_id: Mapped[int] = mapped_column(Integer, ForeignKey('content.id'), index=True, nullable=True)
@@ -289,6 +319,14 @@ class Reels(Base):
 
     reels_title: Mapped[str] = mapped_column(String, nullable=False)
     video_reels: Mapped[str] = mapped_column(String, nullable=False)
+    checksum: Mapped[str] = mapped_column(String(64), nullable=True)
+    hls_status: Mapped[str] = mapped_column(String(16), nullable=True)
+    hls_playlist: Mapped[str] = mapped_column(String, nullable=True)
+    hls_started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    poster: Mapped[str] = mapped_column(String, nullable=True)
+    duration: Mapped[float] = mapped_column(Float, nullable=True)
+    width: Mapped[int] = mapped_column(Integer, nullable=True)
+    height: Mapped[int] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow())
     is_archived: Mapped[bool] = mapped_column(Boolean, default=False)
 
@@ -299,6 +337,9 @@ class Reels(Base):
     who_viewed: Mapped["View"] = relationship("View" , cascade="all, delete-orphan")
     
     view_count: Mapped[int] = mapped_column(Integer, default=0)
+    like_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    comment_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    share_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
     
     liked_by: Mapped[list["User"]] = relationship('User', secondary=reels_likes,  back_populates='liked_reels')
     
@@ -312,6 +353,16 @@ class Reels(Base):
 
 
 
+class MediaObject(Base):
+    __tablename__ = 'media_objects'
+
+    kind: Mapped[str] = mapped_column(String(16), primary_key=True)
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, default=1, server_default='1', nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class Notification(Base):
     __tablename__ = "notifications"
 
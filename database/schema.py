@@ -1,7 +1,23 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, computed_field
 from typing import Optional, List, Union
 from datetime import datetime
 from enum import Enum
+from config.settings import settings
+
+
+class ImageVariants(BaseModel):
+    jpeg: dict[str, str]
+    webp: dict[str, str]
+
+
+def image_variants(filename: Optional[str]) -> Optional[ImageVariants]:
+    # Многие сервисы передают str(user.profile_photo), поэтому None приходит строкой
+    if not filename or filename == "None":
+        return None
+    return ImageVariants(
+        jpeg={str(size): f"/file/{filename}?size={size}" for size in settings.image_variant_sizes},
+        webp={str(size): f"/file/{filename}?size={size}&format=webp" for size in settings.image_variant_sizes},
+    )
 
 
 class MessageUpdate(BaseModel):
@@ -77,10 +93,26 @@ class UserShema(BaseModel):
     sender_profile_photo: Optional[str] = None
     user_content_id: Optional[int] = None
 
+    @computed_field
+    @property
+    def profile_photo_variants(self) -> Optional[ImageVariants]:
+        return image_variants(self.profile_photo)
+
+class ReelsUploadUrl(BaseModel):
+    filename: str
+    upload_url: str
+    expires_in: int
+
+
 class VideoReelsSchema(BaseModel):
     id: int
     video_reels: str
     reels_title: str
+    playlist_url: Optional[str] = None
+    poster: Optional[str] = None
+    duration: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
     user: Optional[UserShema] = None
     created_at: datetime
     is_archived: Optional[bool] = None
@@ -117,6 +149,17 @@ class ContentSchema(BaseModel):
     shered_counts: Optional[int] = None
     commentarion_count: Optional[int] = None
 
+    @computed_field
+    @property
+    def content_photo_variants(self) -> Optional[ImageVariants]:
+        return image_variants(self.content_photo)
+
+
+class ContentFeedPage(BaseModel):
+    items: List[ContentSchema] = []
+    next_cursor: Optional[str] = None
+
+
 class HistoryResponse(BaseModel):
     id: int
     created_at: datetime
@@ -127,6 +170,11 @@ class HistoryResponse(BaseModel):
     who_viewed: Optional[UserShema] = None
     who_liked: Optional[UserShema] = None
 
+    @computed_field
+    @property
+    def content_variants(self) -> Optional[ImageVariants]:
+        return image_variants(self.content)
+
 class UserShemaForContent(BaseModel):
     id: int
     email: Optional[str] = None
@@ -148,6 +196,11 @@ class UserShemaForContent(BaseModel):
     is_closed: Optional[bool] = None
     reels: Optional[List[VideoReelsSchema]] = None
 
+    @computed_field
+    @property
+    def profile_photo_variants(self) -> Optional[ImageVariants]:
+        return image_variants(self.profile_photo)
+
     get_content_with_category: Optional[List[ContentSchema]] = None
 
 
@@ -244,6 +297,25 @@ class Message(MessageBase):
     class Config:
         orm_mode = True
 
+class MessagePage(BaseModel):
+    items: List[Message] = []
+    next_cursor: Optional[str] = None
+
+
+class ChatTimelineItem(BaseModel):
+    kind: str
+    timestamp: datetime
+    message: Optional[Message] = None
+    content: Optional[Content] = None
+    reels: Optional[VideoReelsSchema] = None
+    user: Optional[UserShema] = None
+
+
+class ChatTimelinePage(BaseModel):
+    items: List[ChatTimelineItem] = []
+    next_cursor: Optional[str] = None
+
+
 class ChatBase(BaseModel):
     participants: List[int]
 
@@ -263,6 +335,9 @@ class Chat(ChatBase):
     contents: List[Content] = None
     reels: List[VideoReelsSchema] = None
     users: Optional[List[UserShema]] = None
+    next_cursor: Optional[str] = None
+    last_message: Optional[Message] = None
+    unread_count: int = 0
     
 
     class Config:
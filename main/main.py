@@ -1,23 +1,30 @@
 from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from apscheduler.schedulers.background import BackgroundScheduler
+from prometheus_client import make_asgi_app
+from sqlalchemy import delete
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 import socketio
 from database import database, models
 from authentication import authentication, user
-from router import meno_router, todo, history, commentarion, chat, audio_transelter, video_reels, notification
+from router import meno_router, todo, history, commentarion, chat, audio_transelter, video_reels, notification, media_storage
 from datetime import timedelta, datetime
 from PIL import Image
 from io import BytesIO
 from database.database import Base, engine
-
-Base.metadata.create_all(engine)
+from services.api.v1.view_tracking import view_buffer
+from services.api.v1.broker import broker
+from services.api.v1.chat_membership import membership_cache
+from services.api.v1.storage import storage
+from services.api.v1.media_store import image_store, wait_for_reclaims
+from services.api.v1.reels_processing import resume_reels_processing
 
 from sqladmin import Admin, ModelView
 
 app = FastAPI(title='Meno')
 
+app.mount("/metrics", make_asgi_app())
+
 app.include_router(authentication.router)
 app.include_router(user.router)
 app.include_router(meno_router.router)
@@ -28,6 +35,7 @@ app.include_router(todo.router)
 app.include_router(audio_transelter.audio_router)
 app.include_router(video_reels.video_reels_router)
 app.include_router(notification.notification_router)
+app.include_router(media_storage.storage_router)
 
 
 origins = [
@@ -45,23 +53,48 @@ app.add_middleware(
 
 
 
-scheduler = BackgroundScheduler()
-scheduler.start()
+scheduler = AsyncIOScheduler()
 
-def delete_old_history():
-    db: Session = database.SessionLocal()
+async def delete_old_history():
     time_threshold = datetime.utcnow() - timedelta(hours=24)
-    
-    try:
-        db.query(models.History).filter(models.History.created_at <= time_threshold).delete()
-        db.commit()
-    finally:
-        db.close()
+
+    async with database.SessionLocal() as db:
+        expired = await db.scalars(
+            delete(models.History)
+            .where(models.History.created_at <= time_threshold)
+            .returning(models.History.content)
+        )
+        for content in expired.all():
+            await image_store.release(db, content)
+        await db.commit()
 
 scheduler.add_job(delete_old_history, IntervalTrigger(minutes=10))
+# Фоновые задачи теряются при перезапуске, поэтому недообработанные рилсы подбираются при старте
+scheduler.add_job(
+    resume_reels_processing, IntervalTrigger(minutes=10), next_run_time=datetime.now()
+)
+
+
+@app.on_event("startup")
+async def startup_event():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    scheduler.start()
+    view_buffer.start()
+    await broker.start()
+    await membership_cache.start()
+    await storage.start()
+
 
 @app.on_event("shutdown")
-def shutdown_event():
+async def shutdown_event():
     scheduler.shutdown()
+    await view_buffer.stop()
+    await wait_for_reclaims()
+    await membership_cache.stop()
+    await broker.stop()
+    await storage.stop()
+    await engine.dispose()
 
 
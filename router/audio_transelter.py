@@ -1,32 +1,42 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
-import aiofiles
+from services.api.v1.media_ingestion import stream_upload_to_file
+from config.settings import settings
+import anyio
+import uuid
 import os
 from pydub import AudioSegment
 import speech_recognition as sr
 
 audio_router = APIRouter(tags=["Audio to Text"])
 
-UPLOAD_DIR = "media/"
+UPLOAD_DIR = settings.storage_scratch_dir
 
 @audio_router.post("/audio-text/")
 async def audio_to_text(file: UploadFile = File(...)):
-    temp_file_path = os.path.join(UPLOAD_DIR, file.filename)
+    extension = os.path.splitext(file.filename or "")[1]
+    temp_file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}{extension}")
     wav_file_path = None
     
     try:
-        async with aiofiles.open(temp_file_path, 'wb') as out_file:
-            content = await file.read()
-            await out_file.write(content)
+        await stream_upload_to_file(
+            file,
+            directory=UPLOAD_DIR,
+            filename=os.path.basename(temp_file_path),
+            max_size=settings.audio_max_upload_bytes,
+        )
 
-        wav_file_path = convert_to_wav(temp_file_path)
+        wav_file_path = await anyio.to_thread.run_sync(convert_to_wav, temp_file_path)
 
-        text = recognize_audio(wav_file_path)
+        text = await anyio.to_thread.run_sync(recognize_audio, wav_file_path)
 
         if text is None:
             raise HTTPException(status_code=500, detail="Failed to recognize speech")
         else:
             return {"text": text}
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
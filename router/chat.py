@@ -2,6 +2,7 @@ from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
     WebSocket,
     WebSocketDisconnect,
     status,
@@ -9,10 +10,10 @@ from fastapi import (
     UploadFile,
     Form,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import database, models, schema
 from authentication import oauth
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 import uuid
 import os
@@ -20,21 +21,25 @@ import logging
 import json
 from sqlalchemy import or_
 from services.api.v1.chat_service import websocket_endpoint, ChatService
+from services.api.v1.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
-IMAGEDIR = "media/images"
 
 router = APIRouter(tags=["Chat"])
 
 
 @router.websocket("/ws/{chat_id}")
-async def websocket_connect(websocket: WebSocket, chat_id: int):
-    return await websocket_endpoint(websocket=websocket, chat_id=chat_id)
+async def websocket_connect(
+    websocket: WebSocket,
+    chat_id: int,
+    token: Optional[str] = None,
+):
+    return await websocket_endpoint(websocket=websocket, chat_id=chat_id, token=token)
 
 
 @router.post("/send/{chat_id}/", response_model=schema.Message)
 async def send_message(
     chat_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(oauth.get_current_user),
     img_file: UploadFile = File(None),
     message: str = Form(...),
@@ -50,7 +55,7 @@ async def send_message(
 @router.post("/send_content/{chat_id}/", response_model=schema.UserContentResponse)
 async def send_content(
     request: schema.SendContentSchema,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(oauth.get_current_user),
 ):
     service = ChatService(session=db)
@@ -61,7 +66,7 @@ async def send_content(
 @router.post("/create-chat/", response_model=schema.Chat)
 async def create_chat(
     chat: schema.ChatCreate,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(oauth.get_current_user),
 ):
     service = ChatService(session=db)
@@ -72,7 +77,7 @@ async def create_chat(
 @router.get("/get_user_chat/{chat_id}", response_model=schema.Chat)
 async def get_chat(
     chat_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(oauth.get_current_user),
 ):
     service = ChatService(session=db)
@@ -80,10 +85,51 @@ async def get_chat(
     return await service.get_chat(chat_id=chat_id, current_user=current_user)
 
 
+@router.get("/chats/{chat_id}/messages", response_model=schema.MessagePage)
+async def get_chat_messages(
+    chat_id: int,
+    before: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(oauth.get_current_user),
+):
+    service = ChatService(session=db)
+
+    return await service.get_messages(
+        chat_id=chat_id, current_user=current_user, before=before, limit=limit
+    )
+
+
+@router.get("/chats/{chat_id}/timeline", response_model=schema.ChatTimelinePage)
+async def get_chat_timeline(
+    chat_id: int,
+    before: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(oauth.get_current_user),
+):
+    service = ChatService(session=db)
+
+    return await service.get_timeline(
+        chat_id=chat_id, current_user=current_user, before=before, limit=limit
+    )
+
+
+@router.post("/chats/{chat_id}/read")
+async def mark_chat_read(
+    chat_id: int,
+    db: AsyncSession = Depends(database.get_db),
+    current_user: models.User = Depends(oauth.get_current_user),
+):
+    service = ChatService(session=db)
+
+    return await service.mark_read(chat_id=chat_id, current_user=current_user)
+
+
 @router.delete("/delete-chat/{chat_id}")
 async def delete_chat(
     chat_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(oauth.get_current_user),
 ):
     service = ChatService(session=db)
@@ -93,7 +139,7 @@ async def delete_chat(
 
 @router.get("/my_chats/", response_model=List[schema.Chat])
 async def get_user_chats(
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(oauth.get_current_user),
 ):
     service = ChatService(session=db)
@@ -104,7 +150,7 @@ async def get_user_chats(
 @router.delete("/message-delete/{message_id}/")
 async def delete_message(
     message_id: int,
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(oauth.get_current_user),
 ):
 
@@ -118,7 +164,7 @@ async def delete_message(
 @router.post("/send_reels/{chat_id}/", response_model=schema.UserContentResponse)
 async def send_reels(
     request: schema.SendReelsSchema,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(oauth.get_current_user),
 ):
     service = ChatService(session=db)
@@ -129,7 +175,7 @@ async def send_reels(
 @router.post("/send_user/{chat_id}/", response_model=schema.UserContentResponse)
 async def send_user(
     request: schema.SendUserSchema,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(oauth.get_current_user),
 ):
     service = ChatService(session=db)
@@ -138,7 +184,7 @@ async def send_user(
 
 
 @router.delete('/deleting_content/{content_id}/')
-async def delete_any_content(content_id: int, session: Session = Depends(database.get_db), current_user: models.User = Depends(oauth.get_current_user)):
+async def delete_any_content(content_id: int, session: AsyncSession = Depends(database.get_db), current_user: models.User = Depends(oauth.get_current_user)):
 
     service = ChatService(session=session)
     return await service.delete_any_type_content(content_id=content_id, current_user=current_user)
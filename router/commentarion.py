@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Form
 from typing import List
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import models, database, schema
 from authentication.oauth import get_current_user
 from services.api.v1.commentarion_service import CommentarionService
@@ -12,7 +12,7 @@ router = APIRouter(tags=["Comment"])
 async def create_commentarion(
     content_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     title: str = Form(...),
 ):
 
@@ -25,7 +25,7 @@ async def create_commentarion(
 @router.get("/get-comments/{content_id}/", response_model=List[schema.CommentResponse])
 async def get_comments(
     content_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -36,7 +36,7 @@ async def get_comments(
 @router.delete("/delete-comment/{id}")
 async def delete(
     id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -47,7 +47,7 @@ async def delete(
 @router.post("/create-comment-for-reels/{reels_id}/")
 async def create_comment_for_reels(
     reels_id: int,
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
     comment: str = Form(...),
 ):
@@ -63,7 +63,7 @@ async def create_comment_for_reels(
 )
 async def get_comments_from_reels(
     reels_id: int,
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ) -> List[schema.CommentResponse] | None:
 
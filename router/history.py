@@ -1,17 +1,16 @@
 from fastapi import APIRouter, Depends, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import models, schema, database
 from authentication.oauth import get_current_user
 from services.api.v1.history_service import HistoryService
 
-IMAGEDIR = "media/images/"
 
 router = APIRouter(prefix="/History", tags=["History"])
 
 
 @router.post("/")
 async def create_history(
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
     file: UploadFile = File(...),
 ):
@@ -23,7 +22,7 @@ async def create_history(
 @router.put("/{id}")
 async def like_button(
     history_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -34,7 +33,7 @@ async def like_button(
 @router.get("/history/{id}", response_model=schema.HistoryResponse)
 async def get_content_with_primary_key(
     id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -45,7 +44,7 @@ async def get_content_with_primary_key(
 @router.delete("delete-history/{id}")
 async def delete_history(
     id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
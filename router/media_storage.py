@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from services.api.v1.media_delivery import media_file_response
+from services.api.v1.storage import LocalStorage, StorageError, storage
+from config.settings import settings
+import mimetypes
+import aiofiles
+import aiofiles.os
+import uuid
+import os
+
+
+storage_router = APIRouter(tags=["Storage"])
+
+
+# Эти маршруты нужны только локальному хранилищу: с S3 подписанные ссылки ведут прямо в бакет
+def _authorize(method: str, key: str, expires: int, signature: str) -> str:
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired signature")
+
+    try:
+        valid = storage.verify(method, key, expires, signature)
+    except StorageError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Storage signing is not configured")
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired signature")
+
+    try:
+        return storage.local_path(key)
+    except StorageError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+
+@storage_router.get("/storage/{key:path}")
+async def get_stored_file(
+    key: str,
+    request: Request,
+    expires: int = Query(...),
+    signature: str = Query(...),
+):
+    path = _authorize("GET", key, expires, signature)
+
+    return await media_file_response(request, path, media_type=mimetypes.guess_type(key)[0])
+
+
+@storage_router.put("/storage/{key:path}")
+async def put_stored_file(
+    key: str,
+    request: Request,
+    expires: int = Query(...),
+    signature: str = Query(...),
+):
+    path = _authorize("PUT", key, expires, signature)
+    max_size = settings.reels_max_upload_bytes
+
+    await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4()}.part"
+    size = 0
+
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File is larger than {max_size} bytes.",
+                    )
+                await out.write(chunk)
+
+        await aiofiles.os.replace(temp_path, path)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return {"detail": "Uploaded", "size": size}
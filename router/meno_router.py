@@ -1,12 +1,12 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import models, database, schema
 from authentication.oauth import get_current_user
-from typing import List
+from typing import List, Optional
 from services.api.v1.meno_service import MenoService
+from services.api.v1.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 
-IMAGEDIR = "media/images/"
 
 router = APIRouter(
     tags=["Content"],
@@ -17,7 +17,7 @@ router = APIRouter(
 async def create_content(
     content_title: str = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
     content_for: schema.InteresingContentEnum = Form(...),
 ):
@@ -34,7 +34,7 @@ async def create_content(
 @router.get("/content/{id}", response_model=schema.ContentSchema)
 async def get_content_with_primary_key(
     id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -46,7 +46,7 @@ async def get_content_with_primary_key(
 @router.put("/{content_id}/like")
 async def like_content(
     content_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -58,7 +58,7 @@ async def like_content(
 @router.put("/add-to-user-chosen/{id}/")
 async def add_user_chosen(
     id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -68,7 +68,7 @@ async def add_user_chosen(
 
 @router.get("/popular/", response_model=List[schema.ContentSchema])
 async def get_popular_content(
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -79,7 +79,7 @@ async def get_popular_content(
 
 @router.get("/content/viewed-contents/", response_model=List[schema.ContentSchema])
 async def get_viewed_contents(
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -90,7 +90,7 @@ async def get_viewed_contents(
 
 @router.get("/liked-contents", response_model=List[schema.ContentSchema])
 async def get_user_liked_contents(
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -98,20 +98,24 @@ async def get_user_liked_contents(
     return await service.get_user_liked_contents(current_user=current_user)
 
 
-@router.get("/get-all-publication/", response_model=List[schema.ContentSchema])
+@router.get("/get-all-publication/", response_model=schema.ContentFeedPage)
 async def get_all_publication(
-    db: Session = Depends(database.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     service = MenoService(session=db)
 
-    return await service.get_all_publication(current_user=current_user)
+    return await service.get_all_publication(
+        current_user=current_user, cursor=cursor, limit=limit
+    )
 
 
 @router.delete("/delete-content/{content_id}/")
 async def delete(
     content_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -126,7 +130,7 @@ async def update_content(
     id: int,
     content_for: schema.InteresingContentEnum,
     content_title: str = Form(...),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 
 ):
@@ -142,7 +146,7 @@ async def update_content(
 @router.get("/get-intering-contents/", response_model=List[schema.ContentSchema])
 async def get_intering_contents(
     category: schema.InteresingContentEnum,
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
@@ -156,7 +160,7 @@ async def get_intering_contents(
 @router.put("/add-to-archive/{content_id}/")
 async def add_content_to_archive(
     content_id: int,
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     service = MenoService(session=session)
@@ -168,7 +172,7 @@ async def add_content_to_archive(
 
 @router.get("/get-all-archived-contents/", response_model=List[schema.ContentSchema])
 async def get_all_archived_contents(
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ) -> List[schema.ContentSchema] | None:
 
@@ -183,7 +187,7 @@ async def get_all_archived_contents(
 )
 async def get_likes_from_content(
     content_id: int,
-    session: Session = Depends(database.get_db),
+    session: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
 ):
 
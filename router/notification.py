@@ -1,18 +1,18 @@
 from fastapi import APIRouter, Depends, WebSocket
 from authentication.oauth import get_current_user
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database.database import get_db
 from database.models import User
 from database.schema import NotificationResponse
 from services.api.v1.notification_service import NotificatiinService
-from services.api.v1.chat_service import  manager
+from services.api.v1.connections import notification_manager
 
 notification_router = APIRouter(tags=['Notification'])
 
 @notification_router.websocket("/ws/notifications/")
 async def websocket_endpoint(websocket: WebSocket, current_user: dict = Depends(get_current_user)):
     user_id = current_user.id
-    await manager.connect(websocket, user_id)
+    await notification_manager.connect(websocket, user_id)
 
     try:
         while True:
@@ -20,10 +20,10 @@ async def websocket_endpoint(websocket: WebSocket, current_user: dict = Depends(
     except Exception as e:
         print(f"Ошибка WebSocket: {e}")
     finally:
-        manager.disconnect(websocket, user_id)
+        await notification_manager.disconnect(websocket, user_id)
 
 
 @notification_router.get('/get-user-notifications/', response_model=list[NotificationResponse])
-async def get_all_user_notifcations(session: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_all_user_notifcations(session: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     service = NotificatiinService(session=session)
     return await service.get_all_user_notification(current_user=current_user)
@@ -1,11 +1,10 @@
 from fastapi import APIRouter, File, UploadFile, Depends, Form, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from authentication.oauth import get_current_user
 from database import models, database, schema
 from services.api.v1.todo_service import ToDoService
 from typing import List
 
-IMAGEDIR = 'media/images/'
 
 router = APIRouter(
     tags=['Todo'],
@@ -16,7 +15,7 @@ router = APIRouter(
 @router.post('/create-to-do', response_model=schema.ToDoschema)
 async def create_todo(
 
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
     title: str = Form(...),
     file: UploadFile = File(None),
@@ -27,7 +26,7 @@ async def create_todo(
 
 @router.get('/get-user-todo', response_model=List[schema.ToDoschema])
 async def get_user_todo(
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
 
@@ -40,7 +39,7 @@ async def delete(
 
     id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
 
 ):
     
@@ -52,7 +51,7 @@ async def delete(
 async def update(
 
     id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user),
     title: str = Form(...),
 ):
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException, Request, BackgroundTasks
+from fastapi.responses import RedirectResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from database.models import  User
 from authentication.oauth import get_current_user
 from database.database import get_db
@@ -7,6 +8,10 @@ from database import schema
 from typing import List
 import logging
 from services.api.v1.video_reels_service import VideoReelService
+from services.api.v1.media_store import reels_store
+from services.api.v1.reels_processing import HLS_MEDIA_TYPES, hls_prefix
+from services.api.v1.storage import StorageError, storage
+from config.settings import settings
 import os
 
 logger = logging.getLogger(__name__)
@@ -14,26 +19,49 @@ logger = logging.getLogger(__name__)
 
 video_reels_router = APIRouter(tags=["Video Reels"])
 
-MEDIA_ROOT = "media/reels/"
-
 
 @video_reels_router.post("/create-video-reels/")
 async def create_video_reels(
+    background_tasks: BackgroundTasks,
     reels_title: str = Form(...),
     video_reels: UploadFile = File(...),
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
     place: str = Form(None),
 ):
 
     service = VideoReelService(session=session)
-    return await service.create_video_reels(reels_title=reels_title, video_reels=video_reels, current_user=current_user, place=place)
-    
+    return await service.create_video_reels(reels_title=reels_title, video_reels=video_reels, current_user=current_user, place=place, background_tasks=background_tasks)
+
+
+@video_reels_router.post("/reels-upload-url/", response_model=schema.ReelsUploadUrl)
+async def create_reels_upload_url(
+    session: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> schema.ReelsUploadUrl:
+
+    service = VideoReelService(session=session)
+    return await service.create_upload_url(current_user=current_user)
+
+
+@video_reels_router.post("/create-video-reels-from-upload/")
+async def create_video_reels_from_upload(
+    background_tasks: BackgroundTasks,
+    filename: str = Form(...),
+    reels_title: str = Form(...),
+    session: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    place: str = Form(None),
+):
+
+    service = VideoReelService(session=session)
+    return await service.create_video_reels_from_upload(current_user=current_user, filename=filename, reels_title=reels_title, place=place, background_tasks=background_tasks)
+
 
 @video_reels_router.get("/get-reels/{id}/", response_model=schema.VideoReelsSchema)
 async def get_reels(
     id: int,
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> schema.VideoReelsSchema | None:
 
@@ -44,7 +72,7 @@ async def get_reels(
 
 @video_reels_router.get("/get-all-reels", response_model=List[schema.VideoReelsSchema])
 async def get_all_reels(
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> List[schema.VideoReelsSchema]:
 
@@ -57,7 +85,7 @@ async def get_all_reels(
 @video_reels_router.put("/like-button-for-reels/{reels_id}/")
 async def like_button(
     reels_id: int,
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
 
@@ -70,7 +98,7 @@ async def like_button(
 async def delete_reels(
     reels_id: int,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_db),
 ):
 
     service = VideoReelService(session=session)
@@ -82,7 +110,7 @@ async def update_video_reels(
 
     reels_id: int,
     current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_db),
     reels_title: str = Form(...),
     place: str = Form(None)
 ):
@@ -96,7 +124,7 @@ async def update_video_reels(
 async def add_archive(
     	
     reels_id: int,
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user), 
 
 ):
@@ -108,7 +136,7 @@ async def add_archive(
 
 @video_reels_router.get('/get-user-liked-reels/', response_model=List[schema.VideoReelsSchema])
 async def get_user_liked_contents(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     
@@ -118,7 +146,7 @@ async def get_user_liked_contents(
 
 @video_reels_router.get('/top-reels/', response_model=List[schema.VideoReelsSchema])
 async def get_top_reels(
-    session: Session = Depends(get_db),
+    session: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> List[schema.VideoReelsSchema]:
     
@@ -126,20 +154,42 @@ async def get_top_reels(
     service = VideoReelService(session=session)
     return await service.get_top_reels(current_user=current_user)
 
-import aiofiles
-from fastapi.responses import StreamingResponse
+from services.api.v1.media_delivery import media_file_response
 
 
 @video_reels_router.get("/get_reels/{filename}")
-async def get_video_reels_file(filename: str):
-    file_path = os.path.join(MEDIA_ROOT, filename)
-    if not os.path.exists(file_path):
+async def get_video_reels_file(filename: str, request: Request):
+    file_path = reels_store.path(filename)
+    if file_path is None:
+        return reels_store.redirect(filename)
+
+    media_type = "image/jpeg" if filename.endswith(".jpg") else "video/mp4"
+
+    return await media_file_response(request, file_path, media_type=media_type)
+
+
+@video_reels_router.get("/reels-hls/{reels_id}/{path:path}")
+async def get_video_reels_hls(reels_id: int, path: str, request: Request):
+    media_type = HLS_MEDIA_TYPES.get(os.path.splitext(path)[1])
+    if media_type is None or ".." in path.split("/"):
         raise HTTPException(status_code=404, detail="File not found")
-    
-    async def file_streamer(file_path):
-        async with aiofiles.open(file_path, mode='rb') as file:
-            chunk_size = 1024 * 1024 
-            while chunk := await file.read(chunk_size):
-                yield chunk
-    
-    return StreamingResponse(file_streamer(file_path), media_type="video/mp4")
+
+    key = hls_prefix(reels_id) + path
+    file_path = storage.local_path(key)
+    if file_path is not None:
+        return await media_file_response(request, file_path, media_type=media_type)
+
+    # Плейлисты отдаём сами: относительные ссылки на сегменты должны вести сюда же,
+    # а сегменты клиент забирает напрямую из хранилища
+    if path.endswith(".m3u8"):
+        try:
+            playlist = await storage.get_bytes(key)
+        except StorageError:
+            raise HTTPException(status_code=502, detail="Storage is unavailable")
+        if playlist is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        return Response(playlist, media_type=media_type)
+
+    return RedirectResponse(
+        storage.presigned_get_url(key, settings.presigned_url_ttl_seconds), status_code=307
+    )
@@ -1,5 +1,5 @@
 from fastapi import  HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from authentication.token import create_access_token
 from fastapi.security import OAuth2PasswordRequestForm
 from database import models
@@ -8,11 +8,11 @@ from sqlalchemy import select
 
 
 class AuthenticationService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     async def login(self, request: OAuth2PasswordRequestForm):
-        user_result = self.session.execute(
+        user_result = await self.session.execute(
             select(models.User).filter(models.User.username == request.username)
         )
 
@@ -0,0 +1,141 @@
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+from prometheus_client import Histogram
+from config.settings import Settings, settings
+import redis.asyncio as redis
+import asyncio
+import logging
+import struct
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+BROKER_ROUND_TRIP_SECONDS = Histogram(
+    "broker_round_trip_seconds",
+    "Time between publishing a message and delivering it to a subscriber",
+    ["backend"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+Handler = Callable[[str, bytes], Awaitable[None]]
+
+SENT_AT = struct.Struct("!d")
+
+
+class Broker(ABC):
+    backend = "broker"
+
+    def __init__(self):
+        self.handlers: dict[str, Handler] = {}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, payload: bytes):
+        ...
+
+    async def subscribe(self, channel: str, handler: Handler):
+        self.handlers[channel] = handler
+
+    async def unsubscribe(self, channel: str):
+        self.handlers.pop(channel, None)
+
+    async def dispatch(self, channel: str, payload: bytes, sent_at: float):
+        handler = self.handlers.get(channel)
+        if handler is None:
+            return
+
+        BROKER_ROUND_TRIP_SECONDS.labels(self.backend).observe(time.time() - sent_at)
+
+        try:
+            await handler(channel, payload)
+        except Exception:
+            logger.exception("Broker handler for %s failed", channel)
+
+
+class InMemoryBroker(Broker):
+    backend = "memory"
+
+    async def publish(self, channel: str, payload: bytes):
+        await self.dispatch(channel, payload, time.time())
+
+
+class RedisBroker(Broker):
+    backend = "redis"
+
+    def __init__(self, url: str, poll_timeout: float = 1.0):
+        super().__init__()
+        self.url = url
+        self.poll_timeout = poll_timeout
+        self.client: Optional[redis.Redis] = None
+        self.pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.client is None:
+            self.client = redis.from_url(self.url)
+            self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+
+    async def stop(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+
+        if self.client is not None:
+            await self.pubsub.aclose()
+            await self.client.aclose()
+            self.client = None
+            self.pubsub = None
+
+    async def publish(self, channel: str, payload: bytes):
+        await self.client.publish(channel, SENT_AT.pack(time.time()) + payload)
+
+    async def subscribe(self, channel: str, handler: Handler):
+        await super().subscribe(channel, handler)
+        await self.pubsub.subscribe(channel)
+
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read())
+
+    async def unsubscribe(self, channel: str):
+        await super().unsubscribe(channel)
+        if self.pubsub is not None:
+            await self.pubsub.unsubscribe(channel)
+
+    async def _read(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=self.poll_timeout
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis pub/sub read failed")
+                await asyncio.sleep(self.poll_timeout)
+                continue
+
+            if message is None or message["type"] != "message":
+                continue
+
+            data = message["data"]
+            (sent_at,) = SENT_AT.unpack_from(data)
+            await self.dispatch(
+                message["channel"].decode(), data[SENT_AT.size:], sent_at
+            )
+
+
+def create_broker_from_settings(settings: Settings) -> Broker:
+    if settings.broker_url:
+        return RedisBroker(settings.broker_url)
+    return InMemoryBroker()
+
+
+broker = create_broker_from_settings(settings)
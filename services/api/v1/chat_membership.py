@@ -0,0 +1,87 @@
+from sqlalchemy import select, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from cachetools import TTLCache
+from database import models
+from config.settings import settings
+from .broker import Broker, broker
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+INVALIDATION_CHANNEL = "chat-membership:invalidate"
+
+
+class MembershipCache:
+    """Positive membership checks, cached per worker.
+
+    Only (chat exists, is participant) is cached, so a user added to a chat is
+    admitted on the next request everywhere. Invalidations go out through the
+    broker, so removals and deleted chats reach the other workers too.
+    """
+
+    def __init__(self, broker: Broker, maxsize: int, ttl: float):
+        self.broker = broker
+        self._chats: TTLCache[int, dict[int, tuple[bool, bool]]] = TTLCache(
+            maxsize=maxsize, ttl=ttl
+        )
+
+    def get(self, chat_id: int, user_id: int) -> tuple[bool, bool] | None:
+        members = self._chats.get(chat_id)
+        if members is None:
+            return None
+        return members.get(user_id)
+
+    def set(self, chat_id: int, user_id: int, value: tuple[bool, bool]):
+        members = self._chats.get(chat_id)
+        if members is None:
+            members = self._chats[chat_id] = {}
+        members[user_id] = value
+
+    async def start(self):
+        await self.broker.subscribe(INVALIDATION_CHANNEL, self._on_invalidate)
+
+    async def stop(self):
+        await self.broker.unsubscribe(INVALIDATION_CHANNEL)
+
+    async def invalidate(self, chat_id: int):
+        self._chats.pop(chat_id, None)
+        try:
+            await self.broker.publish(INVALIDATION_CHANNEL, str(chat_id).encode())
+        except Exception:
+            logger.exception("Failed to publish membership invalidation for chat %s", chat_id)
+
+    async def _on_invalidate(self, channel: str, payload: bytes):
+        self._chats.pop(int(payload), None)
+
+
+membership_cache = MembershipCache(
+    broker,
+    maxsize=settings.chat_membership_cache_size,
+    ttl=settings.chat_membership_cache_ttl_seconds,
+)
+
+
+async def check_membership(
+    session: AsyncSession, chat_id: int, user_id: int
+) -> tuple[bool, bool]:
+    """Return (chat_exists, is_participant), served from the cache when possible."""
+    cached = membership_cache.get(chat_id, user_id)
+    if cached is not None:
+        return cached
+
+    result = await session.execute(
+        select(
+            exists().where(models.Chat.id == chat_id),
+            exists().where(
+                models.ChatParticipant.chat_id == chat_id,
+                models.ChatParticipant.user_id == user_id,
+            ),
+        )
+    )
+    chat_exists, is_participant = result.one()
+
+    if chat_exists and is_participant:
+        membership_cache.set(chat_id, user_id, (chat_exists, is_participant))
+    return chat_exists, is_participant
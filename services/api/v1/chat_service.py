@@ -8,56 +8,47 @@ from fastapi import (
     UploadFile,
     Form,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from database import models, schema
+from database.database import SessionLocal
 from authentication import oauth
 from datetime import datetime
-import uuid
-import os
+import hashlib
 import logging
 import json
-from sqlalchemy import or_
-
-
-IMAGEDIR = "media/images"
-
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[int, list[WebSocket]] = {}
-
-    async def connect(self, websocket: WebSocket, chat_id: int):
-        await websocket.accept()
-        if chat_id not in self.active_connections:
-            self.active_connections[chat_id] = []
-        self.active_connections[chat_id].append(websocket)
-
-    async def send_notification(self, user_id: int, notification: dict):
-        # Преобразуем timestamp в isoformat для JSON
-
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                await connection.send_json(notification)
-
-    def disconnect(self, websocket: WebSocket, chat_id: int):
-        if chat_id in self.active_connections:
-            self.active_connections[chat_id].remove(websocket)
-            if not self.active_connections[chat_id]:
-                del self.active_connections[chat_id]
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import or_, select, update, delete, tuple_, literal, union_all, func, case
+from .connections import manager
+from .chat_membership import check_membership, membership_cache
+from .reels_processing import reels_media
+from .media_ingestion import store_image
+from .media_store import image_store
+from .pagination import (
+    DEFAULT_PAGE_SIZE,
+    encode_cursor,
+    decode_cursor,
+    encode_timeline_cursor,
+    decode_timeline_cursor,
+)
 
-    async def broadcast(self, chat_id: int, message: dict):
-        if chat_id in self.active_connections:
-            if "timestamp" in message and isinstance(message["timestamp"], datetime):
-                message["timestamp"] = message["timestamp"].isoformat()
 
-            for connection in self.active_connections[chat_id]:
-                    await connection.send_json(message)
 
 
+def participants_hash(user_ids) -> str:
+    canonical = ",".join(str(user_id) for user_id in sorted(set(user_ids)))
+    return hashlib.sha256(canonical.encode()).hexdigest()
 
-manager = ConnectionManager()
 
+async def websocket_endpoint(websocket: WebSocket, chat_id: int, token: str | None = None):
+    # Сессию не держим всё время жизни сокета: иначе каждое соединение занимает
+    # подключение из пула в состоянии "idle in transaction"
+    current_user = None
+    if token:
+        async with SessionLocal() as session:
+            current_user = await oauth.get_user_from_token(token, session)
+            await session.commit()
 
-async def websocket_endpoint(websocket: WebSocket, chat_id: int):
     await manager.connect(websocket, chat_id)
 
     try:
@@ -66,22 +57,28 @@ async def websocket_endpoint(websocket: WebSocket, chat_id: int):
 
             message_data = json.loads(data)
 
-            if "timestamp" in message_data and isinstance(
-                message_data["timestamp"], datetime
-            ):
-                message_data["timestamp"] = message_data["timestamp"].isoformat()
+            if message_data.get("type") == "read":
+                if current_user is not None:
+                    async with SessionLocal() as session:
+                        try:
+                            await ChatService(session=session).mark_read(
+                                chat_id=chat_id, current_user=current_user
+                            )
+                        except HTTPException:
+                            pass
+                continue
 
             message_data["author"] = message_data.get("author", "Unknown")
             message_data["profile_photo"] = message_data.get("profile_photo", None)
 
             await manager.broadcast(chat_id, message_data)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, chat_id)
+        await manager.disconnect(websocket, chat_id)
 
 
 
 class ChatService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     async def send_message(
@@ -91,26 +88,11 @@ class ChatService:
         img_file: UploadFile = File(None),
         message: str = Form(...),
     ):
+        await self._ensure_participant(chat_id, current_user)
+
         img_filename = None
         if img_file:
-            img_filename = f"{uuid.uuid4()}.jpg"
-            contents = await img_file.read()
-            file_path = os.path.join(IMAGEDIR, img_filename)
-            with open(file_path, "wb") as f:
-                f.write(contents)
-
-        chat = self.session.query(models.Chat).filter(models.Chat.id == chat_id).first()
-        if not chat:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
-            )
-
-        if current_user.id not in [
-            participant.user_id for participant in chat.participants
-        ]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
-            )
+            img_filename = (await store_image(self.session, img_file)).filename
 
         # Создание нового сообщения
         new_message = models.Message(
@@ -124,8 +106,8 @@ class ChatService:
         # Создание уведомления для всех пользователей, кроме автора сообщения
 
         self.session.add(new_message)
-        self.session.commit()
-        self.session.refresh(new_message)
+        await self._bump_unread(chat_id, current_user)
+        await self.session.commit()
 
         # Формирование ответа на сообщение
         message_response = schema.Message(
@@ -134,8 +116,8 @@ class ChatService:
             author_id=new_message.author_id,
             chat_id=new_message.chat_id,
             timestamp=str(new_message.timestamp),
-            profile_photo=new_message.author.profile_photo,
-            author=str(new_message.author.username),
+            profile_photo=current_user.profile_photo,
+            author=str(current_user.username),
             img_file=new_message.img_file,
         )
 
@@ -148,18 +130,10 @@ class ChatService:
         request: schema.SendContentSchema,
         current_user: models.User,
     ):
-        chat = (
-            self.session.query(models.Chat)
-            .filter(models.Chat.id == request.chat_id)
-            .first()
-        )
-        if not chat:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
-            )
+        await self._ensure_participant(request.chat_id, current_user)
 
-        content = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
             .filter(models.Content.id == request.content_id)
             .filter(
                 or_(
@@ -167,20 +141,13 @@ class ChatService:
                     models.Content.is_archived == None,
                 )
             )
-            .first()
         )
+        content = result.scalars().first()
         if not content:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Content not found"
             )
 
-        if current_user.id not in [
-            participant.user_id for participant in chat.participants
-        ]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
-            )
-
         user_content = models.UserContent(
             sender_id=current_user.id,
             content_id=request.content_id,
@@ -192,8 +159,9 @@ class ChatService:
         )
 
         self.session.add(user_content)
-        self.session.commit()
-        self.session.refresh(user_content)
+        content.share_count = models.Content.share_count + 1
+        await self._bump_unread(request.chat_id, current_user)
+        await self.session.commit()
 
         response = schema.UserContentResponse(
             id=user_content.id,
@@ -214,27 +182,15 @@ class ChatService:
         chat: schema.ChatCreate,
         current_user: models.User,
     ):
-        existing_chat = (
-            self.session.query(models.Chat)
-            .filter(
-                models.Chat.participants.any(
-                    models.ChatParticipant.user_id.in_(chat.participants)
-                )
-            )
-            .first()
+        chat_exists = HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Chat with these participants already exists",
         )
 
-        if existing_chat:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Chat with these participants already exists",
-            )
-
-        participants = (
-            self.session.query(models.User)
-            .filter(models.User.id.in_(chat.participants))
-            .all()
+        result = await self.session.execute(
+            select(models.User).filter(models.User.id.in_(chat.participants))
         )
+        participants = list(result.scalars().all())
         if not participants:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Participants not found"
@@ -243,17 +199,32 @@ class ChatService:
         if current_user not in participants:
             participants.append(current_user)
 
-        new_chat = models.Chat()
+        chat_hash = participants_hash(participant.id for participant in participants)
+
+        existing_chat = await self.session.scalar(
+            select(models.Chat.id).filter(models.Chat.participants_hash == chat_hash)
+        )
+        if existing_chat:
+            raise chat_exists
+
+        new_chat = models.Chat(participants_hash=chat_hash)
         self.session.add(new_chat)
-        self.session.flush()
+        try:
+            await self.session.flush()
+        except IntegrityError:
+            await self.session.rollback()
+            raise chat_exists
 
         for participant in participants:
             self.session.add(
                 models.ChatParticipant(chat_id=new_chat.id, user_id=participant.id)
             )
+            self.session.add(
+                models.ChatReadCursor(chat_id=new_chat.id, user_id=participant.id)
+            )
 
-        self.session.commit()
-        self.session.refresh(new_chat)
+        await self.session.commit()
+        await membership_cache.invalidate(new_chat.id)
 
         participants_info = [
             schema.ChatParticipant(
@@ -273,33 +244,23 @@ class ChatService:
         chat_id: int,
         current_user: models.User = Depends(oauth.get_current_user),
     ):
-        chat = self.session.query(models.Chat).filter(models.Chat.id == chat_id).first()
+        await self._ensure_participant(chat_id, current_user)
+
+        result = await self.session.execute(
+            select(models.Chat)
+            .options(
+                selectinload(models.Chat.participants).joinedload(
+                    models.ChatParticipant.user
+                ),
+            )
+            .filter(models.Chat.id == chat_id)
+        )
+        chat = result.scalars().first()
         if not chat:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
             )
 
-        if current_user.id not in [
-            participant.user_id for participant in chat.participants
-        ]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
-            )
-
-        messages = [
-            schema.Message(
-                id=message.id,
-                content=message.message,
-                profile_photo=message.author.profile_photo,
-                img_file=message.img_file,
-                author_id=message.author_id,
-                chat_id=message.chat_id,
-                timestamp=message.timestamp,
-                author=str(message.author.username),
-            )
-            for message in chat.messages
-        ]
-
         participants = [
             schema.ChatParticipant(
                 user=schema.UserShema(
@@ -311,114 +272,311 @@ class ChatService:
             for p in chat.participants
         ]
 
-        user_contents = (
-            self.session.query(models.UserContent)
-            .join(models.Content, models.UserContent.content_id == models.Content.id)
+        page = await self._timeline_page(chat_id=chat_id)
+
+        return schema.Chat(
+            id=chat.id,
+            participants=participants,
+            messages=[item.message for item in page.items if item.message],
+            contents=[item.content for item in page.items if item.content],
+            reels=[item.reels for item in page.items if item.reels],
+            users=[item.user for item in page.items if item.user],
+            next_cursor=page.next_cursor,
+        )
+
+    async def get_timeline(
+        self,
+        chat_id: int,
+        current_user: models.User,
+        before: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> schema.ChatTimelinePage:
+        await self._ensure_participant(chat_id, current_user)
+
+        return await self._timeline_page(chat_id=chat_id, before=before, limit=limit)
+
+    async def _timeline_page(
+        self, chat_id: int, before: str | None = None, limit: int = DEFAULT_PAGE_SIZE
+    ) -> schema.ChatTimelinePage:
+        messages = select(
+            literal("message").label("kind"),
+            models.Message.id.label("id"),
+            models.Message.timestamp.label("timestamp"),
+        ).filter(models.Message.chat_id == chat_id)
+
+        shares = (
+            select(
+                literal("share").label("kind"),
+                models.UserContent.id.label("id"),
+                models.UserContent.created_at.label("timestamp"),
+            )
+            .outerjoin(models.Content, models.UserContent.content_id == models.Content.id)
+            .outerjoin(models.Reels, models.UserContent.reels_id == models.Reels.id)
             .filter(models.UserContent.chat_id == chat_id)
-            .filter(
-                or_(
-                    models.Content.is_archived.is_(False),
-                    models.Content.is_archived.is_(None),
+            .filter(models.Content.is_archived.isnot(True))
+            .filter(models.Reels.is_archived.isnot(True))
+        )
+
+        timeline = union_all(messages, shares).subquery()
+        key = tuple_(timeline.c.timestamp, timeline.c.kind, timeline.c.id)
+
+        query = select(timeline.c.kind, timeline.c.id, timeline.c.timestamp)
+        if before:
+            query = query.filter(key < tuple_(*decode_timeline_cursor(before)))
+
+        result = await self.session.execute(
+            query.order_by(
+                timeline.c.timestamp.desc(), timeline.c.kind.desc(), timeline.c.id.desc()
+            ).limit(limit + 1)
+        )
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_timeline_cursor(rows[-1].timestamp, rows[-1].kind, rows[-1].id)
+
+        message_ids = [row.id for row in rows if row.kind == "message"]
+        share_ids = [row.id for row in rows if row.kind == "share"]
+
+        messages_by_id = {}
+        if message_ids:
+            result = await self.session.execute(
+                select(models.Message)
+                .options(joinedload(models.Message.author))
+                .filter(models.Message.id.in_(message_ids))
+            )
+            messages_by_id = {message.id: message for message in result.scalars()}
+
+        shares_by_id = {}
+        if share_ids:
+            result = await self.session.execute(
+                select(models.UserContent)
+                .options(
+                    joinedload(models.UserContent.sender),
+                    joinedload(models.UserContent.users),
+                    joinedload(models.UserContent.content).joinedload(models.Content.author),
+                    joinedload(models.UserContent.reels).joinedload(models.Reels.user),
                 )
+                .filter(models.UserContent.id.in_(share_ids))
             )
-            .order_by(models.UserContent.created_at.desc())
-            .all()
+            shares_by_id = {share.id: share for share in result.scalars()}
+
+        items = []
+        for row in reversed(rows):
+            if row.kind == "message":
+                message = messages_by_id[row.id]
+                items.append(
+                    schema.ChatTimelineItem(
+                        kind="message",
+                        timestamp=row.timestamp,
+                        message=schema.Message(
+                            id=message.id,
+                            content=message.message,
+                            profile_photo=message.author.profile_photo,
+                            img_file=message.img_file,
+                            author_id=message.author_id,
+                            chat_id=message.chat_id,
+                            timestamp=message.timestamp,
+                            author=str(message.author.username),
+                        ),
+                    )
+                )
+                continue
+
+            share = shares_by_id[row.id]
+
+            if share.content:
+                items.append(
+                    schema.ChatTimelineItem(
+                        kind="content",
+                        timestamp=row.timestamp,
+                        content=schema.Content(
+                            id=share.content.id,
+                            author_id=share.sender_id,
+                            timestamp=share.created_at,
+                            content_creator_username=share.content.author.username,
+                            content_creator_profile_photo=share.content.author.profile_photo,
+                            sender_username=share.sender.username,
+                            content_photo=share.content.content_photo,
+                            sender_profile_photo=share.sender.profile_photo,
+                            sender_id=share.sender_id,
+                            message_sending_content=share.message_for_sending_content,
+                            user_content_id=share.id,
+                        ),
+                    )
+                )
+            elif share.reels:
+                items.append(
+                    schema.ChatTimelineItem(
+                        kind="reels",
+                        timestamp=row.timestamp,
+                        reels=schema.VideoReelsSchema(
+                            id=share.reels.id,
+                            **reels_media(share.reels),
+                            video_reels=str(share.reels.video_reels),
+                            user=schema.UserShema(
+                                id=share.reels.user.id,
+                                username=str(share.reels.user.username),
+                                profile_photo=str(share.reels.user.profile_photo),
+                            ),
+                            sender_id=share.sender_id,
+                            sender_profile_photo=str(share.sender.profile_photo),
+                            sender_username=str(share.sender.username),
+                            reels_title=share.reels.reels_title,
+                            created_at=share.reels.created_at,
+                            view_count=share.reels.view_count,
+                            message_sended_content=share.message_for_sending_content,
+                            user_content_id=share.id,
+                        ),
+                    )
+                )
+            elif share.users:
+                items.append(
+                    schema.ChatTimelineItem(
+                        kind="user",
+                        timestamp=row.timestamp,
+                        user=schema.UserShema(
+                            id=share.users.id,
+                            profile_photo=str(share.users.profile_photo),
+                            username=str(share.users.username),
+                            sender_profile_photo=str(share.sender.profile_photo),
+                            sender_username=str(share.sender.username),
+                            user_content_id=share.id,
+                        ),
+                    )
+                )
+
+        return schema.ChatTimelinePage(items=items, next_cursor=next_cursor)
+
+    async def mark_read(self, chat_id: int, current_user: models.User):
+        read_at = datetime.utcnow()
+
+        result = await self.session.execute(
+            update(models.ChatReadCursor)
+            .where(
+                models.ChatReadCursor.chat_id == chat_id,
+                models.ChatReadCursor.user_id == current_user.id,
+            )
+            .values(last_read_at=read_at, unread_count=0)
+            .returning(models.ChatReadCursor.chat_id)
         )
+        if result.first() is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
+            )
+
+        await self.session.commit()
+
+        await manager.broadcast(
+            chat_id,
+            {
+                "type": "read",
+                "chat_id": chat_id,
+                "user_id": current_user.id,
+                "last_read_at": read_at,
+            },
+        )
+
+        return {"detail": "Chat marked as read"}
+
+    async def _bump_unread(self, chat_id: int, sender: models.User):
+        is_sender = models.ChatReadCursor.user_id == sender.id
 
-        contents = [
-            schema.Content(
-                id=user_content.content.id,
-                author_id=user_content.sender_id,
-                timestamp=user_content.created_at,
-                content_creator_username=user_content.content.author.username,
-                content_creator_profile_photo=user_content.content.author.profile_photo,
-                sender_username=user_content.sender.username,
-                content_photo=user_content.content.content_photo,
-                sender_profile_photo=user_content.sender.profile_photo,
-                sender_id=user_content.sender_id,
-
-                message_sending_content = user_content.message_for_sending_content,
-                user_content_id = user_content.id
+        await self.session.execute(
+            update(models.ChatReadCursor)
+            .where(models.ChatReadCursor.chat_id == chat_id)
+            .values(
+                unread_count=case(
+                    (is_sender, 0), else_=models.ChatReadCursor.unread_count + 1
+                ),
+                last_read_at=case(
+                    (is_sender, datetime.utcnow()),
+                    else_=models.ChatReadCursor.last_read_at,
+                ),
             )
-            for user_content in user_contents
-        ]
+        )
 
-        user_reels = (
-            self.session.query(models.UserContent)
-            .join(models.Reels, models.UserContent.reels_id == models.Reels.id)
-            .filter(models.UserContent.chat_id == chat_id)
-            .filter(
-                or_(
-                    models.Reels.is_archived.is_(False),
-                    models.Reels.is_archived.is_(None),
-                )
+    async def _ensure_participant(self, chat_id: int, current_user: models.User):
+        chat_exists, is_participant = await check_membership(
+            self.session, chat_id, current_user.id
+        )
+        if not chat_exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
             )
-            .order_by(models.UserContent.created_at.desc())
-            .all()
+        if not is_participant:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
+            )
+
+    async def get_messages(
+        self,
+        chat_id: int,
+        current_user: models.User,
+        before: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> schema.MessagePage:
+        await self._ensure_participant(chat_id, current_user)
+
+        return await self._message_page(chat_id=chat_id, before=before, limit=limit)
+
+    async def _message_page(
+        self, chat_id: int, before: str | None = None, limit: int = DEFAULT_PAGE_SIZE
+    ) -> schema.MessagePage:
+        query = (
+            select(models.Message)
+            .options(joinedload(models.Message.author))
+            .filter(models.Message.chat_id == chat_id)
         )
 
-        video_reels = [
-            schema.VideoReelsSchema(
-                id=reels.reels.id,
-                video_reels=str(reels.reels.video_reels),
-                user=schema.UserShema(
-                    id=reels.reels.user.id,
-                    username=str(reels.reels.user.username),
-                    profile_photo=str(reels.reels.user.profile_photo),
-                ),
-                sender_id=reels.sender_id,
-                sender_profile_photo=str(reels.sender.profile_photo),
-                sender_username=str(reels.sender.username),
-                reels_title=reels.reels.reels_title,
-                created_at=reels.reels.created_at,
-                view_count=reels.reels.view_count,
-                message_sended_content = reels.message_for_sending_content if reels.message_for_sending_content else None,
-                
-                user_content_id = reels.id
+        if before:
+            timestamp, id = decode_cursor(before)
+            query = query.filter(
+                tuple_(models.Message.timestamp, models.Message.id) < tuple_(timestamp, id)
             )
-            for reels in user_reels
-        ]
 
-        users = (
-            self.session.query(models.UserContent)
-            .join(models.User, models.UserContent.users_id == models.User.id)
-            .filter(models.UserContent.chat_id == chat_id)
-            .all()
+        result = await self.session.execute(
+            query.order_by(models.Message.timestamp.desc(), models.Message.id.desc())
+            .limit(limit + 1)
         )
+        messages = result.scalars().all()
 
-        users_response = [
-            schema.UserShema(
-                id=user.users.id,
-                profile_photo=str(user.users.profile_photo),
-                username=str(user.users.username),
-                sender_profile_photo=str(user.sender.profile_photo),
-                sender_username=str(user.sender.username),
-                user_content_id = user.id
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = encode_cursor(messages[-1].timestamp, messages[-1].id)
+
+        items = [
+            schema.Message(
+                id=message.id,
+                content=message.message,
+                profile_photo=message.author.profile_photo,
+                img_file=message.img_file,
+                author_id=message.author_id,
+                chat_id=message.chat_id,
+                timestamp=message.timestamp,
+                author=str(message.author.username),
             )
-            for user in users
+            for message in reversed(messages)
         ]
 
-        return schema.Chat(
-            id=chat.id,
-            participants=participants,
-            messages=messages,
-            contents=contents,
-            reels=video_reels,
-            users=users_response,
-        )
+        return schema.MessagePage(items=items, next_cursor=next_cursor)
 
     async def delete_chat(
         self,
         chat_id: int,
         current_user: models.User,
     ):
-        chat = self.session.query(models.Chat).filter(models.Chat.id == chat_id).first()
+        chat_exists, is_participant = await check_membership(
+            self.session, chat_id, current_user.id
+        )
 
-        if not chat:
+        if not chat_exists:
             logging.info(f"Chat with ID {chat_id} not found")
             raise HTTPException(status_code=404, detail="Chat not found")
 
-        if current_user.id not in [p.user_id for p in chat.participants]:
+        if not is_participant:
             logging.info(
                 f"User {current_user.id} not authorized to delete chat {chat_id}"
             )
@@ -426,8 +584,16 @@ class ChatService:
                 status_code=403, detail="Not authorized to delete this chat"
             )
 
-        self.session.delete(chat)
-        self.session.commit()
+        result = await self.session.execute(
+            select(models.Chat)
+            .options(selectinload(models.Chat.participants))
+            .filter(models.Chat.id == chat_id)
+        )
+        chat = result.scalars().first()
+
+        await self.session.delete(chat)
+        await self.session.commit()
+        await membership_cache.invalidate(chat_id)
 
         logging.info(f"Chat with ID {chat_id} successfully deleted")
         return {"detail": "Chat deleted successfully"}
@@ -436,12 +602,52 @@ class ChatService:
         self,
         current_user: models.User,
     ):
-        user_chats = (
-            self.session.query(models.Chat)
+        result = await self.session.execute(
+            select(models.Chat)
+            .options(
+                selectinload(models.Chat.participants).joinedload(
+                    models.ChatParticipant.user
+                ),
+            )
             .join(models.ChatParticipant)
             .filter(models.ChatParticipant.user_id == current_user.id)
-            .all()
         )
+        user_chats = result.scalars().all()
+        chat_ids = [chat.id for chat in user_chats]
+
+        last_messages = {}
+        unread_counts = {}
+        if chat_ids:
+            ranked = (
+                select(
+                    models.Message.id,
+                    func.row_number()
+                    .over(
+                        partition_by=models.Message.chat_id,
+                        order_by=(models.Message.timestamp.desc(), models.Message.id.desc()),
+                    )
+                    .label("position"),
+                )
+                .filter(models.Message.chat_id.in_(chat_ids))
+                .subquery()
+            )
+            result = await self.session.execute(
+                select(models.Message)
+                .options(joinedload(models.Message.author))
+                .join(ranked, ranked.c.id == models.Message.id)
+                .filter(ranked.c.position == 1)
+            )
+            last_messages = {message.chat_id: message for message in result.scalars()}
+
+            result = await self.session.execute(
+                select(
+                    models.ChatReadCursor.chat_id, models.ChatReadCursor.unread_count
+                ).filter(
+                    models.ChatReadCursor.chat_id.in_(chat_ids),
+                    models.ChatReadCursor.user_id == current_user.id,
+                )
+            )
+            unread_counts = dict(result.all())
 
         chat_list = []
         for chat in user_chats:
@@ -457,14 +663,31 @@ class ChatService:
                 for participant in chat.participants
             ]
 
+            last_message = last_messages.get(chat.id)
+
             chat_list.append(
                 schema.Chat(
                     id=chat.id,
                     participants=participants_info,
-                    contents=chat.user_content,
+                    last_message=schema.Message(
+                        id=last_message.id,
+                        content=last_message.message,
+                        profile_photo=last_message.author.profile_photo,
+                        img_file=last_message.img_file,
+                        author_id=last_message.author_id,
+                        chat_id=last_message.chat_id,
+                        timestamp=last_message.timestamp,
+                        author=str(last_message.author.username),
+                    ) if last_message else None,
+                    unread_count=unread_counts.get(chat.id, 0),
                 )
             )
 
+        chat_list.sort(
+            key=lambda chat: chat.last_message.timestamp if chat.last_message else datetime.min,
+            reverse=True,
+        )
+
         return chat_list
 
     async def delete_message(
@@ -473,18 +696,15 @@ class ChatService:
         current_user: models.User,
     ):
 
-        message = (
-            self.session.query(models.Message)
-            .filter(models.Message.id == message_id)
-            .first()
-        )
+        message = await self.session.get(models.Message, message_id)
         if not message:
             raise HTTPException(detail="Message Not found", status_code=404)
 
         if message.author_id == current_user.id:
 
-            self.session.delete(message)
-            self.session.commit()
+            await image_store.release(self.session, message.img_file)
+            await self.session.delete(message)
+            await self.session.commit()
             return "Message Deleted Succsesfully"
 
         else:
@@ -496,18 +716,33 @@ class ChatService:
         current_user: models.User,
     ):
 
-        content = (
-            self.session.query(models.UserContent)
+        # Счётчики уменьшаем только если запись удалил именно этот запрос
+        result = await self.session.execute(
+            delete(models.UserContent)
             .filter(models.UserContent.id == content_id)
             .filter(models.UserContent.sender_id == current_user.id)
-            .first()
+            .returning(models.UserContent.content_id, models.UserContent.reels_id)
         )
+        content = result.first()
 
         if not content:
             raise HTTPException(detail="Not Found", status_code=404)
 
-        self.session.delete(content)
-        self.session.commit()
+        if content.content_id is not None:
+            await self.session.execute(
+                update(models.Content)
+                .filter(models.Content.id == content.content_id)
+                .values(share_count=models.Content.share_count - 1)
+            )
+
+        if content.reels_id is not None:
+            await self.session.execute(
+                update(models.Reels)
+                .filter(models.Reels.id == content.reels_id)
+                .values(share_count=models.Reels.share_count - 1)
+            )
+
+        await self.session.commit()
 
         return "Deleted Succsesfully"
 
@@ -516,36 +751,21 @@ class ChatService:
         request: schema.SendReelsSchema,
         current_user: models.User,
     ):
-        chat = (
-            self.session.query(models.Chat)
-            .filter(models.Chat.id == request.chat_id)
-            .first()
-        )
-        if not chat:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
-            )
+        await self._ensure_participant(request.chat_id, current_user)
 
-        content = (
-            self.session.query(models.Reels)
+        result = await self.session.execute(
+            select(models.Reels)
             .filter(models.Reels.id == request.reels_id)
             .filter(
                 or_(models.Reels.is_archived != True, models.Reels.is_archived == None)
             )
-            .first()
         )
+        content = result.scalars().first()
         if not content:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Content not found"
             )
 
-        if current_user.id not in [
-            participant.user_id for participant in chat.participants
-        ]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
-            )
-
         user_content = models.UserContent(
             sender_id=current_user.id,
             reels_id=request.reels_id,
@@ -555,8 +775,9 @@ class ChatService:
         )
 
         self.session.add(user_content)
-        self.session.commit()
-        self.session.refresh(user_content)
+        content.share_count = models.Reels.share_count + 1
+        await self._bump_unread(request.chat_id, current_user)
+        await self.session.commit()
 
         response = schema.UserContentResponse(
             id=user_content.id,
@@ -576,33 +797,14 @@ class ChatService:
         request: schema.SendUserSchema,
         current_user: models.User,
     ):
-        chat = (
-            self.session.query(models.Chat)
-            .filter(models.Chat.id == request.chat_id)
-            .first()
-        )
-        if not chat:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
-            )
+        await self._ensure_participant(request.chat_id, current_user)
 
-        content = (
-            self.session.query(models.User)
-            .filter(models.User.id == request.user_id)
-            .first()
-        )
+        content = await self.session.get(models.User, request.user_id)
         if not content:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Content not found"
             )
 
-        if current_user.id not in [
-            participant.user_id for participant in chat.participants
-        ]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail="Access denied"
-            )
-
         user_content = models.UserContent(
             sender_id=current_user.id,
             users_id=request.user_id,
@@ -611,8 +813,8 @@ class ChatService:
         )
 
         self.session.add(user_content)
-        self.session.commit()
-        self.session.refresh(user_content)
+        await self._bump_unread(request.chat_id, current_user)
+        await self.session.commit()
 
         response = schema.UserContentResponse(
             id=user_content.id,
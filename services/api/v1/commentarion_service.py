@@ -2,23 +2,21 @@ from fastapi import Form, HTTPException
 import json
 from typing import List
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import select, update, delete
 from database import models, schema
 
 
 class CommentarionService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create_commentarion(
         self, content_id: int, current_user: models.User, title: str = Form(...)
     ):
 
-        content = (
-            self.session.query(models.Content)
-            .filter(models.Content.id == content_id)
-            .first()
-        )
+        content = await self.session.get(models.Content, content_id)
 
         if content:
 
@@ -30,8 +28,9 @@ class CommentarionService:
             )
 
             self.session.add(new_commentarion_obj)
-            self.session.commit()
-            self.session.refresh(new_commentarion_obj)
+            content.comment_count = models.Content.comment_count + 1
+            await self.session.commit()
+            await self.session.refresh(new_commentarion_obj)
 
             return new_commentarion_obj
 
@@ -43,21 +42,18 @@ class CommentarionService:
         current_user: models.User,
     ):
 
-        content_model = (
-            self.session.query(models.Content)
-            .filter(models.Content.id == content_id)
-            .first()
-        )
+        content_model = await self.session.get(models.Content, content_id)
 
         if not content_model:
             raise HTTPException(status_code=404, detail="Content not found")
 
-        comments = (
-            self.session.query(models.CommentarionModel)
+        result = await self.session.execute(
+            select(models.CommentarionModel)
+            .options(joinedload(models.CommentarionModel.user))
             .filter(models.CommentarionModel.content_id == content_id)
             .order_by(models.CommentarionModel.date_pub.desc())
-            .all()
         )
+        comments = result.scalars().all()
 
         if not comments:
             raise HTTPException(
@@ -82,17 +78,32 @@ class CommentarionService:
 
     async def delete(self, id: int, current_user: models.User):
 
-        comment = (
-            self.session.query(models.CommentarionModel)
+        # Счётчики уменьшаем только если комментарий удалил именно этот запрос
+        result = await self.session.execute(
+            delete(models.CommentarionModel)
             .filter(models.CommentarionModel.user_id == current_user.id)
             .filter(models.CommentarionModel.id == id)
-            .first()
+            .returning(models.CommentarionModel.content_id, models.CommentarionModel.reels_id)
         )
+        comment = result.first()
 
         if comment:
 
-            self.session.delete(comment)
-            self.session.commit()
+            if comment.content_id is not None:
+                await self.session.execute(
+                    update(models.Content)
+                    .filter(models.Content.id == comment.content_id)
+                    .values(comment_count=models.Content.comment_count - 1)
+                )
+
+            if comment.reels_id is not None:
+                await self.session.execute(
+                    update(models.Reels)
+                    .filter(models.Reels.id == comment.reels_id)
+                    .values(comment_count=models.Reels.comment_count - 1)
+                )
+
+            await self.session.commit()
             return "Comment Deleted Succsesfully"
 
         raise HTTPException(detail=f"Commentarion with {id} not found", status_code=404)
@@ -101,9 +112,7 @@ class CommentarionService:
         self, reels_id: int, current_user: models.User, comment: str = Form(...)
     ):
 
-        reels = (
-            self.session.query(models.Reels).filter(models.Reels.id == reels_id).first()
-        )
+        reels = await self.session.get(models.Reels, reels_id)
         if not reels:
             raise HTTPException(detail="Not Found", status_code=404)
 
@@ -115,7 +124,8 @@ class CommentarionService:
         )
 
         self.session.add(new_comment)
-        self.session.commit()
+        reels.comment_count = models.Reels.comment_count + 1
+        await self.session.commit()
 
         return new_comment
 
@@ -123,17 +133,16 @@ class CommentarionService:
         self, reels_id: int, current_user: models.User
     ) -> List[schema.CommentResponse] | None:
 
-        reels = (
-            self.session.query(models.Reels).filter(models.Reels.id == reels_id).first()
-        )
+        reels = await self.session.get(models.Reels, reels_id)
         if not reels:
             raise HTTPException(detail="Reels not found", status_code=404)
 
-        comments = (
-            self.session.query(models.CommentarionModel)
+        result = await self.session.execute(
+            select(models.CommentarionModel)
+            .options(joinedload(models.CommentarionModel.user))
             .filter(models.CommentarionModel.reels_id == reels.id)
-            .all()
         )
+        comments = result.scalars().all()
         if not comments:
             return []
 
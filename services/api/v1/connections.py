@@ -0,0 +1,182 @@
+from fastapi import WebSocket, status
+from fastapi.encoders import jsonable_encoder
+from prometheus_client import Counter, Gauge, Histogram
+from config.settings import settings
+from .broker import Broker, broker
+import asyncio
+import logging
+import orjson
+
+
+logger = logging.getLogger(__name__)
+
+
+WEBSOCKET_QUEUE_DEPTH = Histogram(
+    "websocket_send_queue_depth",
+    "Outbound queue depth of a websocket connection when a frame is enqueued",
+    ["namespace"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+WEBSOCKET_DROPPED_TOTAL = Counter(
+    "websocket_dropped_messages_total",
+    "Frames not delivered because a connection's outbound queue was full",
+    ["namespace", "policy"],
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_connections",
+    "Open websocket connections on this worker",
+    ["namespace"],
+)
+WEBSOCKET_QUEUED_FRAMES = Gauge(
+    "websocket_queued_frames",
+    "Frames waiting in the outbound queues of all connections on this worker",
+    ["namespace"],
+)
+WEBSOCKET_MAX_QUEUE_DEPTH = Gauge(
+    "websocket_max_queue_depth",
+    "Outbound queue depth of the most backed-up connection on this worker",
+    ["namespace"],
+)
+
+
+def encode_message(message: dict) -> bytes:
+    return orjson.dumps(message, default=jsonable_encoder)
+
+
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, key: int, max_queue: int):
+        self.websocket = websocket
+        self.key = key
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_queue)
+        self.writer: asyncio.Task | None = None
+
+    def enqueue(self, frame: str) -> bool:
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def write(self):
+        while True:
+            frame = await self.queue.get()
+            await self.websocket.send_text(frame)
+
+    async def close(self, code: int):
+        if self.writer is not None:
+            self.writer.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        broker: Broker,
+        namespace: str,
+        max_queue: int = settings.websocket_send_queue_size,
+        slow_consumer_policy: str = settings.websocket_slow_consumer_policy,
+    ):
+        self.broker = broker
+        self.namespace = namespace
+        self.max_queue = max_queue
+        self.slow_consumer_policy = slow_consumer_policy
+        self.active_connections: dict[int, list[ClientConnection]] = {}
+        # Ссылки на задачи закрытия, иначе сборщик мусора может удалить их до запуска
+        self._closing: set[asyncio.Task] = set()
+
+        # Значения считаются при каждом опросе /metrics
+        WEBSOCKET_CONNECTIONS.labels(namespace).set_function(
+            lambda: sum(1 for _ in self._connections())
+        )
+        WEBSOCKET_QUEUED_FRAMES.labels(namespace).set_function(
+            lambda: sum(connection.queue.qsize() for connection in self._connections())
+        )
+        WEBSOCKET_MAX_QUEUE_DEPTH.labels(namespace).set_function(
+            lambda: max((connection.queue.qsize() for connection in self._connections()), default=0)
+        )
+
+    def channel(self, key: int) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def connect(self, websocket: WebSocket, key: int):
+        await websocket.accept()
+
+        connection = ClientConnection(websocket, key, self.max_queue)
+        connection.writer = asyncio.create_task(self._run_writer(connection))
+
+        if key not in self.active_connections:
+            self.active_connections[key] = []
+            await self.broker.subscribe(self.channel(key), self.deliver)
+        self.active_connections[key].append(connection)
+
+    async def disconnect(self, websocket: WebSocket, key: int):
+        for connection in self.active_connections.get(key, []):
+            if connection.websocket is websocket:
+                if connection.writer is not None:
+                    connection.writer.cancel()
+                await self._remove(connection)
+                return
+
+    async def broadcast(self, key: int, message: dict):
+        try:
+            await self.broker.publish(self.channel(key), encode_message(message))
+        except Exception:
+            logger.exception("Failed to publish to %s", self.channel(key))
+
+    async def send_notification(self, user_id: int, notification: dict):
+        await self.broadcast(user_id, notification)
+
+    async def deliver(self, channel: str, payload: bytes):
+        key = int(channel.rsplit(":", 1)[1])
+        connections = self.active_connections.get(key)
+        if not connections:
+            return
+
+        frame = payload.decode()
+
+        for connection in list(connections):
+            WEBSOCKET_QUEUE_DEPTH.labels(self.namespace).observe(connection.queue.qsize())
+
+            if connection.enqueue(frame):
+                continue
+
+            WEBSOCKET_DROPPED_TOTAL.labels(self.namespace, self.slow_consumer_policy).inc()
+
+            if self.slow_consumer_policy == "disconnect":
+                await self._remove(connection)
+                task = asyncio.create_task(connection.close(status.WS_1013_TRY_AGAIN_LATER))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+
+    def _connections(self):
+        for connections in list(self.active_connections.values()):
+            yield from connections
+
+    async def _run_writer(self, connection: ClientConnection):
+        try:
+            await connection.write()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.info("Dropping dead websocket on %s", self.channel(connection.key))
+            await self._remove(connection)
+
+    async def _remove(self, connection: ClientConnection):
+        connections = self.active_connections.get(connection.key)
+        if not connections or connection not in connections:
+            return
+
+        connections.remove(connection)
+        if not connections:
+            del self.active_connections[connection.key]
+            await self.broker.unsubscribe(self.channel(connection.key))
+
+            if connection.key in self.active_connections:
+                await self.broker.subscribe(self.channel(connection.key), self.deliver)
+
+
+manager = ConnectionManager(broker, namespace="chat")
+notification_manager = ConnectionManager(broker, namespace="notifications")
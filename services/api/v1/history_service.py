@@ -1,18 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import select, insert, delete
 from database import models, schema
+from .view_tracking import view_buffer
+from .media_ingestion import store_image
+from .media_store import image_store
 from authentication.oauth import get_current_user
-import os
-import uuid
 from datetime import timedelta, datetime
 
-IMAGEDIR = "media/images/"
 
 router = APIRouter(prefix="/History", tags=["History"])
 
 
 class HistoryService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create_history(
@@ -21,22 +23,17 @@ class HistoryService:
         file: UploadFile = File(...),
     ):
 
-        file.filename = f"{uuid.uuid4()}.jpg"
-        history = await file.read()
-
-        file_path = os.path.join(IMAGEDIR, file.filename)
-        with open(file_path, "wb") as f:
-            f.write(history)
+        stored = await store_image(self.session, file)
 
         new_history_obj = models.History(
-            content=file.filename,
+            content=stored.filename,
             author_id=current_user.id,
             created_at=datetime.utcnow(),
             delete_at=datetime.utcnow() + timedelta(days=1),
         )
 
         self.session.add(new_history_obj)
-        self.session.commit()
+        await self.session.commit()
 
         return {"message": "Content created successfully", "content": new_history_obj}
 
@@ -44,58 +41,58 @@ class HistoryService:
         self, history_id: int, current_user: models.User = Depends(get_current_user)
     ):
 
-        history_model = (
-            self.session.query(models.History)
-            .filter(models.History.id == history_id)
-            .first()
-        )
+        history_model = await self.session.get(models.History, history_id)
 
         if not history_model:
             raise HTTPException(detail="History Not found", status_code=404)
 
-        if current_user in history_model.liked_by:
-            history_model.liked_by.remove(current_user)
+        is_liked = await self.session.scalar(
+            select(models.history_likes.c.user_id).filter(
+                models.history_likes.c.history_id == history_id,
+                models.history_likes.c.user_id == current_user.id,
+            )
+        )
+
+        if is_liked:
+            await self.session.execute(
+                delete(models.history_likes).filter(
+                    models.history_likes.c.history_id == history_id,
+                    models.history_likes.c.user_id == current_user.id,
+                )
+            )
 
         else:
-            history_model.liked_by.append(current_user)
+            await self.session.execute(
+                insert(models.history_likes).values(
+                    history_id=history_id, user_id=current_user.id
+                )
+            )
 
-        self.session.commit()
-        self.session.refresh(current_user)
-        self.session.refresh(history_model)
+        await self.session.commit()
         return {"message": "Content liked/unliked successfully"}
 
     async def get_history_with_primary_key(
         self, id: int, current_user: models.User = Depends(get_current_user)
     ):
 
-        detail = (
-            self.session.query(models.History).filter(models.History.id == id).first()
+        result = await self.session.execute(
+            select(models.History)
+            .options(
+                joinedload(models.History.author),
+                selectinload(models.History.liked_by),
+                selectinload(models.History.who_viewed).joinedload(models.View.user),
+                selectinload(models.History.who_liked),
+            )
+            .filter(models.History.id == id)
         )
+        detail = result.scalars().first()
 
         if not detail:
             raise HTTPException(
                 status_code=404, detail=f"Content with id {id} not found"
             )
 
-        existing_view = (
-            self.session.query(models.View)
-            .filter(
-                models.View.history_id == id, models.View.user_id == current_user.id
-            )
-            .first()
-        )
-
-        if not existing_view:
-
-            new_view = models.View(
-                history_id=id, user_id=current_user.id, viewed_at=datetime.utcnow()
-            )
-
-            self.session.add(new_view)
-
-            detail.views_count = (detail.views_count or 0) + 1
-            self.session.commit()
-            self.session.refresh(new_view)
+        view_buffer.record("history", id, current_user.id)
 
         like = detail.liked_by
         likes_count = len(like)
@@ -104,7 +101,7 @@ class HistoryService:
             id=detail.who_viewed.user_id,
             username=str(detail.who_viewed.user.username),
             profile_photo=str(detail.who_viewed.user.profile_photo),
-        )
+        ) if detail.who_viewed else None
 
         who_liked_history = detail.who_liked
 
@@ -137,16 +134,15 @@ class HistoryService:
         self, id: int, current_user: models.User = Depends(get_current_user)
     ):
 
-        history_obj = (
-            self.session.query(models.History).filter(models.History.id == id).first()
-        )
+        history_obj = await self.session.get(models.History, id)
 
         if not history_obj:
             raise HTTPException(detail="Not found", status_code=404)
 
         if current_user.id == history_obj.author_id:
 
-            self.session.delete(history_obj)
-            self.session.commit()
+            await image_store.release(self.session, history_obj.content)
+            await self.session.delete(history_obj)
+            await self.session.commit()
 
             return {"message": "History Deleted Succsesfully"}
@@ -0,0 +1,127 @@
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+from prometheus_client import Histogram
+from pydantic import BaseModel
+import io
+import math
+
+
+IMAGE_COMPRESSION_PASSES = Histogram(
+    "image_compression_encode_passes",
+    "JPEG encodes needed to bring an upload under its size budget",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 12, 16),
+)
+
+ORIENTATION_TAG = 0x0112
+
+MIN_QUALITY = 20
+MAX_QUALITY = 85
+QUALITY_STEP = 5
+MAX_RESIZE_ROUNDS = 4
+
+# Размер JPEG растёт примерно линейно с числом пикселей, берём небольшой запас
+RESIZE_HEADROOM = 0.9
+# Уменьшенный кадр, занявший меньше этой доли бюджета, пробуем увеличить
+TARGET_FILL = 0.75
+# Примерное отношение размера при среднем качестве к размеру при MAX_QUALITY
+MID_QUALITY_RATIO = 0.3
+
+
+class CompressedImage(BaseModel):
+    data: bytes
+    width: int
+    height: int
+    quality: int
+    passes: int
+
+
+def normalize_image(image: Image.Image) -> Image.Image:
+    """Apply EXIF orientation and flatten to RGB so the JPEG encoder accepts it."""
+    if image.getexif().get(ORIENTATION_TAG, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+
+    if image.mode != "RGB":
+        return image.convert("RGB")
+
+    image.load()
+    return image
+
+
+def compress_to_size(image: Image.Image, target_bytes: int) -> CompressedImage:
+    """Encode image as a JPEG no larger than target_bytes.
+
+    The source is decoded once. Each resize starts from that buffer, and the
+    target resolution comes from the measured size of the previous encode:
+    it shrinks when nothing fits and grows back when a downscaled result
+    leaves most of the budget unused. At each resolution the quality is
+    binary-searched, and the number of resize rounds is bounded, so an
+    upload needs at most a couple of dozen encodes.
+    """
+    source = normalize_image(image)
+    passes = 0
+
+    def encode(frame: Image.Image, quality: int) -> bytes:
+        nonlocal passes
+        passes += 1
+        with io.BytesIO() as buffer:
+            frame.save(buffer, format="JPEG", quality=quality)
+            return buffer.getvalue()
+
+    def result(frame: Image.Image, data: bytes, quality: int) -> CompressedImage:
+        IMAGE_COMPRESSION_PASSES.observe(passes)
+        return CompressedImage(
+            data=data, width=frame.width, height=frame.height, quality=quality, passes=passes
+        )
+
+    frame = source
+    data = encode(frame, MAX_QUALITY)
+    if len(data) <= target_bytes:
+        return result(frame, data, MAX_QUALITY)
+
+    qualities = list(range(MIN_QUALITY, MAX_QUALITY, QUALITY_STEP))
+    scale = 1.0
+    estimate = len(data) * MID_QUALITY_RATIO
+    best = None
+
+    for _ in range(MAX_RESIZE_ROUNDS):
+        scale = min(1.0, scale * math.sqrt(target_bytes / estimate) * RESIZE_HEADROOM)
+        size = (max(1, round(source.width * scale)), max(1, round(source.height * scale)))
+        if size != frame.size:
+            frame = source.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        fitting = None
+        low, high = 0, len(qualities) - 1
+        while low <= high:
+            middle = (low + high) // 2
+            candidate = encode(frame, qualities[middle])
+            if len(candidate) <= target_bytes:
+                fitting = (frame, candidate, qualities[middle])
+                low = middle + 1
+            else:
+                data = candidate
+                high = middle - 1
+
+        if fitting is None:
+            # Не влезло даже при MIN_QUALITY: data — это кодирование при минимальном качестве
+            estimate = len(data)
+            continue
+
+        if best is None or len(fitting[1]) > len(best[1]):
+            best = fitting
+        if scale >= 1.0 or len(fitting[1]) >= target_bytes * TARGET_FILL:
+            break
+        estimate = len(fitting[1])
+
+    if best is not None:
+        return result(*best)
+
+    raise HTTPException(
+        status_code=500,
+        detail=f"Failed to compress image to {target_bytes // 1024} KB.",
+    )
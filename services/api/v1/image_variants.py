@@ -0,0 +1,72 @@
+from PIL import Image
+from config.settings import settings
+from typing import Optional
+import io
+import os
+
+
+VARIANT_FORMATS = {
+    "jpeg": ("jpg", "JPEG"),
+    "webp": ("webp", "WEBP"),
+}
+
+
+def variant_filename(filename: str, size: int, format: str) -> str:
+    stem, _ = os.path.splitext(filename)
+    extension, _ = VARIANT_FORMATS[format]
+    return f"{stem}_{size}.{extension}"
+
+
+def variant_filenames(filename: str) -> list[str]:
+    return [
+        variant_filename(filename, size, format)
+        for size in settings.image_variant_sizes
+        for format in VARIANT_FORMATS
+    ]
+
+
+def render_variants(
+    image: Image.Image,
+    filename: str,
+    max_side: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> dict[str, bytes]:
+    """Encode the configured thumbnail sizes of an already decoded image.
+
+    Sizes bound the longest side. Each size is resized from the previous, larger
+    one. Sizes at or above the stored original (max_side, by default the
+    source) are skipped, since the original already serves them, and so is
+    any encode that is not smaller than the original's max_bytes.
+    """
+    variants = {}
+    frame = image
+    max_side = max_side or max(image.size)
+
+    for size in sorted(settings.image_variant_sizes, reverse=True):
+        if size >= max_side:
+            continue
+
+        frame = frame.copy()
+        frame.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        for format, (_, encoder) in VARIANT_FORMATS.items():
+            quality = settings.image_webp_quality if format == "webp" else settings.image_jpeg_quality
+            with io.BytesIO() as buffer:
+                frame.save(buffer, format=encoder, quality=quality)
+                data = buffer.getvalue()
+
+            if max_bytes is None or len(data) < max_bytes:
+                variants[variant_filename(filename, size, format)] = data
+
+    return variants
+
+
+def pick_variant(filename: str, size: Optional[int], format: str) -> Optional[str]:
+    """Name of the smallest derivative at least `size` wide, or None for the original."""
+    if size is None:
+        return None
+
+    candidates = [s for s in sorted(settings.image_variant_sizes) if s >= size]
+    if not candidates:
+        return None
+    return variant_filename(filename, candidates[0], format)
@@ -0,0 +1,259 @@
+from fastapi import HTTPException, Request, status
+from fastapi.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+from email.utils import formatdate, parsedate_to_datetime
+from cachetools import TTLCache
+from config.settings import settings
+from typing import Optional
+import aiofiles.os
+import anyio
+import stat
+import re
+import os
+
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+BYTE_RANGE = re.compile(r"(\d*)-(\d*)", re.ASCII)
+
+
+class MediaFileResponse(Response):
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        stat_result: os.stat_result,
+        start: int,
+        end: int,
+        status_code: int,
+        headers: dict[str, str],
+        media_type: str | None = None,
+    ):
+        self.path = path
+        self.stat_result = stat_result
+        self.start = start
+        self.end = end
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+
+    @property
+    def is_full_file(self) -> bool:
+        return self.start == 0 and self.end >= self.stat_result.st_size - 1
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        extensions = scope.get("extensions") or {}
+
+        if self.is_full_file and "http.response.zerocopysend" not in extensions:
+            response = FileResponse(
+                self.path,
+                status_code=self.status_code,
+                headers=dict(self.headers),
+                media_type=self.media_type,
+                stat_result=self.stat_result,
+            )
+            await response(scope, receive, send)
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+
+        count = self.end - self.start + 1
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            if "http.response.zerocopysend" in extensions:
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": file.wrapped,
+                        "offset": self.start,
+                        "count": count,
+                        "more_body": False,
+                    }
+                )
+                return
+
+            await file.seek(self.start)
+            while count > 0:
+                chunk = await file.read(min(self.chunk_size, count))
+                if not chunk:
+                    break
+                count -= len(chunk)
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": count > 0}
+                )
+
+        if count > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def _stat_file(path: str) -> Optional[os.stat_result]:
+    try:
+        stat_result = await aiofiles.os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    return stat_result if stat.S_ISREG(stat_result.st_mode) else None
+
+
+class StatCache:
+    """Short-lived stat results for files whose content never changes in place."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries: TTLCache[str, Optional[os.stat_result]] = TTLCache(
+            maxsize=maxsize, ttl=ttl
+        )
+
+    async def stat(self, path: str) -> Optional[os.stat_result]:
+        try:
+            return self._entries[path]
+        except KeyError:
+            pass
+
+        stat_result = await _stat_file(path)
+        self._entries[path] = stat_result
+        return stat_result
+
+    def invalidate(self, path: str):
+        self._entries.pop(path, None)
+
+
+stat_cache = StatCache(
+    maxsize=settings.media_stat_cache_size,
+    ttl=settings.media_stat_cache_ttl_seconds,
+)
+
+
+def file_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def _not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(stat_result.st_mtime) <= since
+
+    return False
+
+
+def _range_applies(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+
+    if if_range.startswith('"'):
+        return if_range == etag
+
+    try:
+        return int(stat_result.st_mtime) <= parsedate_to_datetime(if_range).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single `bytes=` range; raise 416 if it cannot be satisfied.
+
+    Returns None when the header should be ignored (unknown unit, several
+    ranges or an invalid range such as bytes=5-3, see RFC 9110 14.1.1),
+    in which case the whole file is served.
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+
+    match = BYTE_RANGE.fullmatch(ranges.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    elif last:
+        length = int(last)
+        start, end = max(size - length, 0), size - 1
+        if length == 0:
+            start = size
+    else:
+        return None
+
+    if start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+    return start, end
+
+
+async def media_file_response(
+    request: Request,
+    path: str,
+    media_type: str | None = None,
+    etag: str | None = None,
+    cache_control: str | None = None,
+    cached_stat: bool = False,
+) -> Response:
+    """Serve a file with ETag/304, single-range and zero-copy support.
+
+    Pass cached_stat only for files that are never rewritten in place; their
+    stat results are then reused for a short while via stat_cache.
+    """
+    stat_result = await (stat_cache.stat(path) if cached_stat else _stat_file(path))
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    size = stat_result.st_size
+    etag = etag or file_etag(stat_result)
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+    if cache_control is not None:
+        headers["cache-control"] = cache_control
+
+    if _not_modified(request, etag, stat_result):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    start, end = 0, size - 1
+    status_code = status.HTTP_200_OK
+
+    range_header = request.headers.get("range")
+    if range_header and size and _range_applies(request, etag, stat_result):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+    headers["content-length"] = str(end - start + 1)
+
+    return MediaFileResponse(
+        path,
+        stat_result=stat_result,
+        start=start,
+        end=end,
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
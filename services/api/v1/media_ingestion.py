@@ -0,0 +1,178 @@
+from fastapi import HTTPException, UploadFile, status
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from PIL import Image, UnidentifiedImageError
+from config.settings import settings
+from typing import Collection, Optional
+from .image_compression import compress_to_size, normalize_image
+from .image_variants import render_variants
+from .media_store import image_store
+import aiofiles
+import aiofiles.os
+import hashlib
+import anyio
+import uuid
+import io
+import os
+
+
+IMAGE_TYPES = frozenset({"image/jpeg", "image/png", "image/gif", "image/webp"})
+VIDEO_TYPES = frozenset({"video/mp4", "video/quicktime"})
+
+# Кодирование картинок нагружает CPU, поэтому держим отдельный небольшой лимит потоков
+_image_workers = anyio.CapacityLimiter(settings.image_processing_workers)
+
+
+class StoredUpload(BaseModel):
+    filename: str
+    size: int
+    checksum: str
+    media_type: Optional[str] = None
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        return "video/quicktime" if head[8:12] == b"qt  " else "video/mp4"
+    return None
+
+
+async def stream_upload_to_file(
+    upload: UploadFile,
+    directory: str,
+    filename: str,
+    max_size: int,
+    min_size: int = 0,
+    accept: Optional[Collection[str]] = None,
+    chunk_size: int = settings.media_upload_chunk_bytes,
+) -> StoredUpload:
+    """Copy an upload to directory/filename in chunks, hashing it on the way.
+
+    The data goes to a temporary file in the same directory and is renamed
+    into place only once it is complete, so readers never see a partial file.
+    When accept is given, the first chunk's magic bytes must match one of
+    those media types; the client-supplied content type is not trusted.
+    """
+    await aiofiles.os.makedirs(directory, exist_ok=True)
+
+    final_path = os.path.join(directory, filename)
+    temp_path = os.path.join(directory, f".{uuid.uuid4()}.part")
+
+    digest = hashlib.sha256()
+    size = 0
+    media_type = None
+
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await upload.read(chunk_size):
+                if size == 0:
+                    media_type = sniff_media_type(chunk)
+                    if accept is not None and media_type not in accept:
+                        raise HTTPException(
+                            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Unsupported file type.",
+                        )
+
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File is larger than {max_size} bytes.",
+                    )
+
+                digest.update(chunk)
+                await out.write(chunk)
+
+        if size <= min_size:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File size must be greater than {min_size} bytes.",
+            )
+
+        await aiofiles.os.replace(temp_path, final_path)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return StoredUpload(
+        filename=filename, size=size, checksum=digest.hexdigest(), media_type=media_type
+    )
+
+
+def _encode_image(source: str, target_size_kb: Optional[int]) -> dict[str, bytes]:
+    try:
+        with Image.open(source) as image:
+            image = normalize_image(image)
+
+            if target_size_kb is not None:
+                compressed = compress_to_size(image, target_size_kb * 1024)
+                data = compressed.data
+                max_side = max(compressed.width, compressed.height)
+            else:
+                with io.BytesIO() as buffer:
+                    image.save(
+                        buffer, format="JPEG", quality=settings.image_jpeg_quality, optimize=True
+                    )
+                    data = buffer.getvalue()
+                max_side = max(image.size)
+
+            # Миниатюры не должны быть больше сжатого оригинала ни по размеру, ни по весу
+            filename = f"{hashlib.sha256(data).hexdigest()}.jpg"
+            variants = render_variants(image, filename, max_side=max_side, max_bytes=len(data))
+            return {filename: data, **variants}
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image file."
+        )
+
+
+async def store_image(
+    session: AsyncSession,
+    upload: UploadFile,
+    target_size_kb: Optional[int] = None,
+    max_size: int = settings.image_max_upload_bytes,
+) -> StoredUpload:
+    """Stream an image upload to scratch space and re-encode it as a normalized JPEG.
+
+    Orientation is applied, alpha is flattened and metadata is dropped.
+    With target_size_kb the result is compressed to fit that budget. Thumbnail
+    derivatives (see image_variants) are rendered alongside. Decoding and
+    encoding run on a bounded set of worker threads, and the result is
+    stored in image_store under the hash of the encoded bytes.
+    """
+    raw = await stream_upload_to_file(
+        upload,
+        directory=image_store.scratch_dir,
+        filename=f".{uuid.uuid4()}.upload",
+        max_size=max_size,
+        min_size=0,
+        accept=IMAGE_TYPES,
+    )
+    raw_path = os.path.join(image_store.scratch_dir, raw.filename)
+
+    try:
+        files = await anyio.to_thread.run_sync(
+            _encode_image, raw_path, target_size_kb, limiter=_image_workers
+        )
+    finally:
+        await aiofiles.os.remove(raw_path)
+
+    filename = await image_store.put_bytes(session, files)
+    data = files[filename]
+
+    return StoredUpload(
+        filename=filename,
+        size=len(data),
+        checksum=os.path.splitext(filename)[0],
+        media_type="image/jpeg",
+    )
@@ -0,0 +1,283 @@
+from fastapi.responses import RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, event, update
+from database.database import SessionLocal
+from database.models import MediaObject
+from config.settings import settings
+from typing import Callable, Optional
+from datetime import datetime, timezone
+from cachetools import LRUCache
+from .image_variants import variant_filenames
+from .media_delivery import IMMUTABLE_CACHE_CONTROL, stat_cache
+from .storage import Storage, storage
+import aiofiles.os
+import mimetypes
+import asyncio
+import logging
+import time
+import re
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+HASHED_NAME = re.compile(r"^[0-9a-f]{64}(?=[._])")
+
+
+def is_hashed(name: str) -> bool:
+    return HASHED_NAME.match(name) is not None
+
+
+class MediaStore:
+    """Content-addressed, reference-counted media files.
+
+    Objects are named after the sha256 of their bytes and sharded two levels
+    deep (ab/cd/abcd...jpg), so identical uploads share one file and no
+    directory grows without bound. Files derived from an object, such as
+    thumbnails or posters, share its hash prefix and so its directory.
+    Names that are not hashes predate the store (or were uploaded directly
+    by clients) and resolve flat under legacy_prefix.
+
+    Bytes live in `storage` under prefix; the database only tracks names.
+    acquire/release run in the caller's session; the reference is only
+    durable once the caller commits, and files of released objects are only
+    removed after that commit succeeds. Files written for an object that the
+    caller then rolls back are removed as well.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        prefix: str,
+        legacy_prefix: Optional[str] = None,
+        derived: Callable[[str], list[str]] = lambda name: [],
+        storage: Storage = storage,
+    ):
+        self.kind = kind
+        self.prefix = prefix
+        self.legacy_prefix = legacy_prefix or prefix
+        self.derived = derived
+        self.storage = storage
+        # Содержимое хешированных имён не меняется, поэтому ответ хранилища можно не переспрашивать
+        self._remote_exists: LRUCache[str, bool] = LRUCache(maxsize=settings.media_stat_cache_size)
+
+    def key(self, name: str) -> str:
+        name = os.path.basename(name)
+        if is_hashed(name):
+            return f"{self.prefix}{name[:2]}/{name[2:4]}/{name}"
+        return f"{self.legacy_prefix}{name}"
+
+    def path(self, name: str) -> Optional[str]:
+        """Local file for `name`, or None when the storage backend is remote."""
+        return self.storage.local_path(self.key(name))
+
+    @property
+    def scratch_dir(self) -> str:
+        """Directory for temporary files that are later moved into the store."""
+        return self.storage.local_path(self.prefix) or os.path.join(
+            settings.storage_scratch_dir, self.kind
+        )
+
+    def redirect(self, name: str) -> RedirectResponse:
+        """Cacheable redirect to `name` in remote storage.
+
+        The public URL of a hashed name never changes. Otherwise the URL is
+        signed at the start of a window of half its lifetime, so it is the
+        same for every request in the window, and the redirect is cached only
+        until the window ends, while the URL is still valid.
+        """
+        key = self.key(name)
+        public_url = self.storage.public_url(key)
+        if public_url is not None and is_hashed(name):
+            return RedirectResponse(
+                public_url, status_code=307, headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+            )
+
+        ttl = settings.presigned_url_ttl_seconds
+        window = max(ttl // 2, 1)
+        now = int(time.time())
+        signed_at = now - now % window
+        url = public_url or self.storage.presigned_get_url(
+            key, ttl, now=datetime.fromtimestamp(signed_at, timezone.utc)
+        )
+        return RedirectResponse(
+            url,
+            status_code=307,
+            headers={"Cache-Control": f"private, max-age={signed_at + window - now}"},
+        )
+
+    async def exists(self, name: str) -> bool:
+        path = self.path(name)
+        if path is not None:
+            return await stat_cache.stat(path) is not None
+
+        if not is_hashed(name):
+            return await self.storage.size(self.key(name)) is not None
+
+        try:
+            return self._remote_exists[name]
+        except KeyError:
+            pass
+
+        exists = await self.storage.size(self.key(name)) is not None
+        self._remote_exists[name] = exists
+        return exists
+
+    async def acquire(self, session: AsyncSession, name: str, size: int) -> bool:
+        """Add a reference to `name`; True when its bytes still have to be written.
+
+        The upsert keeps the row locked until the caller commits, so a
+        concurrent release of the last reference cannot unlink the file after
+        we decided not to write it.
+        """
+        statement = (
+            insert(MediaObject)
+            .values(kind=self.kind, key=name, size=size, ref_count=1)
+            .on_conflict_do_update(
+                index_elements=[MediaObject.kind, MediaObject.key],
+                set_={"ref_count": MediaObject.ref_count + 1},
+            )
+            .returning(MediaObject.ref_count)
+        )
+        ref_count = await session.scalar(statement)
+
+        return ref_count == 1 or await self.storage.size(self.key(name)) is None
+
+    async def put_bytes(self, session: AsyncSession, files: dict[str, bytes]) -> str:
+        """Store an object given as {name: bytes, derived name: bytes, ...}; the first entry is the object."""
+        name = next(iter(files))
+        if await self.acquire(session, name, len(files[name])):
+            _unlink_after_rollback(session, self, name)
+            for key, data in files.items():
+                await self.storage.put_bytes(self.key(key), data, mimetypes.guess_type(key)[0])
+                self._invalidate(key)
+        return name
+
+    async def put_file(self, session: AsyncSession, temp_path: str, name: str, size: int) -> str:
+        """Move an already written temporary file into the store, or drop it if the object exists."""
+        if await self.acquire(session, name, size):
+            _unlink_after_rollback(session, self, name)
+            await self.storage.put_file(self.key(name), temp_path, mimetypes.guess_type(name)[0])
+            self._invalidate(name)
+        else:
+            await aiofiles.os.remove(temp_path)
+        return name
+
+    async def release(self, session: AsyncSession, name: Optional[str]):
+        """Drop a reference; the last one removes the object and its derived files after commit."""
+        if not name or name == "None":
+            return
+
+        if not is_hashed(name):
+            _unlink_after_commit(session, self, name)
+            return
+
+        ref_count = await session.scalar(
+            update(MediaObject)
+            .where(MediaObject.kind == self.kind, MediaObject.key == name)
+            .values(ref_count=MediaObject.ref_count - 1)
+            .returning(MediaObject.ref_count)
+        )
+        if ref_count is None or ref_count > 0:
+            return
+
+        await session.execute(
+            delete(MediaObject).where(MediaObject.kind == self.kind, MediaObject.key == name)
+        )
+        _unlink_after_commit(session, self, name)
+
+    async def reclaim(self, name: str):
+        """Remove the files of a released object unless it has been acquired again since."""
+        async with SessionLocal() as session:
+            # Пустая строка-заглушка блокирует ключ: параллельный acquire дождётся
+            # удаления файлов и запишет их заново, а если объект уже снова занят,
+            # вставка не пройдёт и файлы останутся
+            tombstone = await session.scalar(
+                insert(MediaObject)
+                .values(kind=self.kind, key=name, size=0, ref_count=0)
+                .on_conflict_do_nothing()
+                .returning(MediaObject.key)
+            )
+            if tombstone is None:
+                return
+
+            await self._unlink(name)
+            await session.execute(
+                delete(MediaObject).where(MediaObject.kind == self.kind, MediaObject.key == name)
+            )
+            await session.commit()
+
+    async def _unlink(self, name: str):
+        for key in [name, *self.derived(name)]:
+            self._invalidate(key)
+            await self.storage.delete(self.key(key))
+
+    def _invalidate(self, name: str):
+        self._remote_exists.pop(name, None)
+        path = self.path(name)
+        if path is not None:
+            stat_cache.invalidate(path)
+
+
+PENDING_UNLINKS = "media_store.pending_unlinks"
+PENDING_WRITES = "media_store.pending_writes"
+
+_reclaim_tasks: set[asyncio.Task] = set()
+
+
+def _unlink_after_commit(session: AsyncSession, store: MediaStore, name: str):
+    session.sync_session.info.setdefault(PENDING_UNLINKS, []).append((store, name))
+
+
+def _unlink_after_rollback(session: AsyncSession, store: MediaStore, name: str):
+    session.sync_session.info.setdefault(PENDING_WRITES, []).append((store, name))
+
+
+async def _reclaim(pending: list[tuple[MediaStore, str]]):
+    for store, name in pending:
+        try:
+            await store.reclaim(name)
+        except Exception:
+            logger.exception("Failed to remove released %s object %s", store.kind, name)
+
+
+def _schedule_reclaim(pending: Optional[list[tuple[MediaStore, str]]]):
+    if pending:
+        task = asyncio.get_running_loop().create_task(_reclaim(pending))
+        _reclaim_tasks.add(task)
+        task.add_done_callback(_reclaim_tasks.discard)
+
+
+@event.listens_for(Session, "after_commit")
+def _reclaim_after_commit(session: Session):
+    session.info.pop(PENDING_WRITES, None)
+    _schedule_reclaim(session.info.pop(PENDING_UNLINKS, None))
+
+
+# Транзакция закончилась без коммита (откат или закрытие сессии): записанные
+# файлы остались без строки в media_objects и никому не принадлежат
+@event.listens_for(Session, "after_transaction_end")
+def _reclaim_after_rollback(session: Session, transaction):
+    if transaction.parent is not None:
+        return
+    session.info.pop(PENDING_UNLINKS, None)
+    _schedule_reclaim(session.info.pop(PENDING_WRITES, None))
+
+
+async def wait_for_reclaims():
+    """Let removals scheduled by committed or rolled back transactions finish, e.g. on shutdown."""
+    if _reclaim_tasks:
+        await asyncio.gather(*_reclaim_tasks, return_exceptions=True)
+
+
+def _poster_filenames(name: str) -> list[str]:
+    return [f"{os.path.splitext(name)[0]}.jpg"]
+
+
+image_store = MediaStore("image", "images/", derived=variant_filenames)
+reels_store = MediaStore(
+    "reels", "reels/objects/", legacy_prefix="reels/", derived=_poster_filenames
+)
@@ -1,53 +1,24 @@
 from fastapi import HTTPException, UploadFile, File, Form, status
-from sqlalchemy.orm import Session
-import os
-import uuid
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from database import models, database, schema
 from authentication.oauth import get_current_user
-from typing import List
+from typing import List, Optional
 from sqlalchemy.sql import func
-from sqlalchemy import or_
-from PIL import Image
-import io
-from .chat_service import manager
+from sqlalchemy import or_, tuple_, select, delete as sql_delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import joinedload
+from .connections import notification_manager
+from .pagination import DEFAULT_PAGE_SIZE, encode_cursor, decode_cursor
+from .view_tracking import view_buffer
+from .media_ingestion import store_image
+from .media_store import image_store
 
-IMAGEDIR = "media/images/"
 
 class MenoService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
-    def compress_image_exact_size(
-        self, image: Image, target_size_kb: int, output_path: str
-    ):
-        """Compress the image to exactly 50 KB, adjusting quality and resolution as needed."""
-        quality = 85
-        width, height = image.size
-
-        while True:
-            with io.BytesIO() as img_bytes:
-                image.save(img_bytes, format="JPEG", quality=quality)
-                size_kb = img_bytes.tell() / 1024
-
-                if size_kb <= target_size_kb:
-                    with open(output_path, "wb") as out_file:
-                        out_file.write(img_bytes.getvalue())
-                    break
-
-            if size_kb > target_size_kb:
-                width = int(width * 0.9)
-                height = int(height * 0.9)
-                image = image.resize((width, height), Image.Resampling.LANCZOS)
-
-            quality -= 5
-
-            if quality < 10 and size_kb > target_size_kb:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to compress image to 50 KB.",
-                )
-
     async def create_content(
         self,
         current_user: models.User,
@@ -56,34 +27,27 @@ class MenoService:
         content_for: schema.InteresingContentEnum,
     ):
 
-        file.filename = f"{uuid.uuid4()}.jpg"
-
-        image = Image.open(io.BytesIO(await file.read()))
-
-        file_path = os.path.join(IMAGEDIR, file.filename)
-
-        from starlette.concurrency import run_in_threadpool
-
-        await run_in_threadpool(self.compress_image_exact_size, image, 50, file_path)
+        stored = await store_image(self.session, file, target_size_kb=50)
 
         new_content = models.Content(
             content_title=content_title,
-            content_photo=file.filename,
+            content_photo=stored.filename,
             author_id=current_user.id,
             created_at=datetime.utcnow(),
             content_for=content_for,
         )
 
         self.session.add(new_content)
-        self.session.commit()
-        self.session.refresh(new_content)
+        await self.session.commit()
+        await self.session.refresh(new_content)
 
         return {"message": "Content created successfully", "content": new_content}
 
     async def get_content_with_primary_key(self, id: int, current_user: models.User):
 
-        detail = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .filter(models.Content.id == id)
             .filter(
                 or_(
@@ -91,38 +55,15 @@ class MenoService:
                     models.Content.is_archived == None,
                 )
             )
-            .first()
         )
+        detail = result.scalars().first()
 
         if not detail:
             raise HTTPException(
                 detail=f"Content with id {id} not found", status_code=404
             )
 
-        like = detail.liked_by
-        like_count = len(like)
-
-        comments_count = len(detail.commentarion)
-
-        shered_count = len(detail.user_contents)
-
-        existing_view = (
-            self.session.query(models.View)
-            .filter(
-                models.View.content_id == id, models.View.user_id == current_user.id
-            )
-            .first()
-        )
-
-        if not existing_view:
-            new_view = models.View(
-                content_id=id, user_id=current_user.id, viewed_at=datetime.utcnow()
-            )
-
-            self.session.add(new_view)
-            detail.view_count = (detail.view_count or 0) + 1
-            self.session.commit()
-            self.session.refresh(new_view)
+        view_buffer.record("content", id, current_user.id)
 
         response_data = schema.ContentSchema(
             id=detail.id,
@@ -135,30 +76,46 @@ class MenoService:
             ),
             created_at=detail.created_at,
             view_count=detail.view_count,
-            like_count=like_count,
-            commentarion_count=comments_count,
-            shered_counts=shered_count,
+            like_count=detail.like_count,
+            commentarion_count=detail.comment_count,
+            shered_counts=detail.share_count,
         )
 
         return response_data
     
     async def like_content(self, content_id: int, current_user: models.User):
         # Поиск контента по ID
-        content = (
-            self.session.query(models.Content)
-            .filter(models.Content.id == content_id)
-            .first()
-        )
+        content = await self.session.get(models.Content, content_id)
 
         if not content:
             raise HTTPException(status_code=404, detail="Content not found")
 
-        # Проверка, лайкнул ли текущий пользователь контент
-        if current_user in content.liked_by:
-            content.liked_by.remove(current_user)
+        # Счётчик меняем только если строка лайка действительно удалена или вставлена,
+        # иначе параллельные запросы сдвигают его навсегда
+        unliked = await self.session.scalar(
+            sql_delete(models.content_likes)
+            .filter(
+                models.content_likes.c.content_id == content_id,
+                models.content_likes.c.user_id == current_user.id,
+            )
+            .returning(models.content_likes.c.user_id)
+        )
+
+        if unliked is not None:
+            content.like_count = models.Content.like_count - 1
             action = "unliked"
         else:
-            content.liked_by.append(current_user)
+            liked = await self.session.scalar(
+                insert(models.content_likes)
+                .values(content_id=content_id, user_id=current_user.id)
+                .on_conflict_do_nothing()
+                .returning(models.content_likes.c.user_id)
+            )
+            if liked is None:
+                # Параллельный запрос уже поставил этот лайк
+                return {"message": "Content liked successfully"}
+
+            content.like_count = models.Content.like_count + 1
             action = "liked"
 
             notification = models.Notification(
@@ -170,13 +127,30 @@ class MenoService:
 
             self.session.add(notification)
 
-            await manager.send_notification(notification.user_id, notification)
-
-
-        self.session.commit()
-
-        self.session.refresh(current_user)
-        self.session.refresh(content)
+        await self.session.commit()
+
+        if action == "liked":
+            await notification_manager.send_notification(
+                notification.user_id,
+                schema.NotificationResponse(
+                    id=notification.id,
+                    user_id=notification.user_id,
+                    sender_id=notification.sender_id,
+                    created_at=notification.created_at,
+                    sender=schema.UserShema(
+                        id=current_user.id,
+                        username=current_user.username,
+                        profile_photo=current_user.profile_photo,
+                    ),
+                    content=schema.ContentSchema(
+                        id=content.id,
+                        content_title=content.content_title,
+                        content_photo=content.content_photo,
+                        created_at=content.created_at,
+                    ),
+                    type=notification.type,
+                ).dict(),
+            )
 
 
         return {"message": f"Content {action} successfully"}
@@ -184,25 +158,36 @@ class MenoService:
 
     async def add_user_chosen(self, id: int, current_user: models.User):
 
-        content = (
-            self.session.query(models.Content).filter(models.Content.id == id).first()
-        )
+        content = await self.session.get(models.Content, id)
 
         if not content:
             raise HTTPException(
                 detail=f"Content With id {id} Not found", status_code=404
             )
 
-        if current_user in content.user_chosen:
-            content.user_chosen.remove(current_user)
+        is_chosen = await self.session.scalar(
+            select(models.chosen.c.user_id).filter(
+                models.chosen.c.content_id == id,
+                models.chosen.c.user_id == current_user.id,
+            )
+        )
+
+        if is_chosen:
+            await self.session.execute(
+                sql_delete(models.chosen).filter(
+                    models.chosen.c.content_id == id,
+                    models.chosen.c.user_id == current_user.id,
+                )
+            )
+            await self.session.commit()
             return "Added Succsesfully"
 
         else:
-            content.user_chosen.append(current_user)
+            await self.session.execute(
+                insert(models.chosen).values(content_id=id, user_id=current_user.id)
+            )
 
-        self.session.commit()
-        self.session.refresh(current_user)
-        self.session.refresh(content)
+        await self.session.commit()
 
         return {"detail": "Added/Removed"}
 
@@ -211,28 +196,19 @@ class MenoService:
         current_user: models.User,
     ):
 
-        subquery = (
-            self.session.query(
-                models.content_likes.c.content_id,
-                func.count(models.content_likes.c.user_id).label("like_count"),
-            )
-            .group_by(models.content_likes.c.content_id)
-            .subquery()
-        )
-
-        popular_content_query = (
-            self.session.query(models.Content, subquery.c.like_count)
-            .join(subquery, models.Content.id == subquery.c.content_id)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .order_by(models.Content.created_at.desc())
-            .filter(subquery.c.like_count > 0)
+            .filter(models.Content.like_count > 0)
             .filter(
                 or_(
                     models.Content.is_archived != True,
                     models.Content.is_archived == None,
                 )
             )
-            .all()
         )
+        popular_content_query = result.scalars().all()
 
         if not popular_content_query:
             raise HTTPException(
@@ -240,7 +216,7 @@ class MenoService:
             )
 
         response = []
-        for content, like_count in popular_content_query:
+        for content in popular_content_query:
             response.append(
                 schema.ContentSchema(
                     id=content.id,
@@ -254,7 +230,7 @@ class MenoService:
                     profile_photo=content.author.profile_photo,
                     view_count=content.view_count,
                     created_at=content.created_at,
-                    like_count=like_count,
+                    like_count=content.like_count,
                 )
             )
 
@@ -265,17 +241,19 @@ class MenoService:
         current_user: models.User,
     ):
 
-        viewed_content_ids = (
-            self.session.query(models.View.content_id)
-            .filter(models.View.user_id == current_user.id)
-            .all()
+        result = await self.session.execute(
+            select(models.View.content_id).filter(
+                models.View.user_id == current_user.id
+            )
         )
+        viewed_content_ids = result.all()
 
         if not viewed_content_ids:
             return []
 
-        viewed_contents = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .order_by(models.Content.created_at.desc())
             .filter(models.Content.id.in_([vc[0] for vc in viewed_content_ids]))
             .filter(
@@ -284,8 +262,8 @@ class MenoService:
                     models.Content.is_archived == None,
                 )
             )
-            .all()
         )
+        viewed_contents = result.scalars().all()
 
         response_data = [
             schema.ContentSchema(
@@ -309,17 +287,19 @@ class MenoService:
         self,
         current_user: models.User,
     ):
-        liked_content_ids = (
-            self.session.query(models.content_likes.c.content_id)
-            .filter(models.content_likes.c.user_id == current_user.id)
-            .all()
+        result = await self.session.execute(
+            select(models.content_likes.c.content_id).filter(
+                models.content_likes.c.user_id == current_user.id
+            )
         )
+        liked_content_ids = result.all()
 
         if not liked_content_ids:
             return []
 
-        liked_contents = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .order_by(models.Content.created_at.desc())
             .filter(
                 models.Content.id.in_(
@@ -332,8 +312,8 @@ class MenoService:
                     models.Content.is_archived == None,
                 )
             )
-            .all()
         )
+        liked_contents = result.scalars().all()
 
         response_data = [
             schema.ContentSchema(
@@ -357,53 +337,59 @@ class MenoService:
     async def get_all_publication(
         self,
         current_user: models.User,
-    ):
-        publications = (
-            self.session.query(models.Content)
-            .order_by(models.Content.created_at.desc())
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> schema.ContentFeedPage:
+        query = (
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .filter(
                 or_(
                     models.Content.is_archived != True,
                     models.Content.is_archived == None,
                 )
             )
-            .all()
         )
 
-        response = []
+        if cursor:
+            created_at, content_id = decode_cursor(cursor)
+            query = query.filter(
+                tuple_(models.Content.created_at, models.Content.id)
+                < tuple_(created_at, content_id)
+            )
 
-        for content in publications:
+        result = await self.session.execute(
+            query.order_by(models.Content.created_at.desc(), models.Content.id.desc())
+            .limit(limit + 1)
+        )
+        publications = result.scalars().all()
 
-            comments_count = (
-                self.session.query(models.CommentarionModel)
-                .filter(models.CommentarionModel.content_id == content.id)
-                .count()
-            )
-            shered_counts = (
-                self.session.query(models.UserContent)
-                .filter(models.UserContent.content_id == content.id)
-                .count()
-            )
+        next_cursor = None
+        if len(publications) > limit:
+            publications = publications[:limit]
+            last = publications[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
 
-            response.append(
-                schema.ContentSchema(
-                    id=content.id,
-                    author=schema.UserShema(
-                        id=content.author.id,
-                        username=str(content.author.username),
-                        profile_photo=str(content.author.profile_photo),
-                    ),
-                    content_title=content.content_title,
-                    created_at=content.created_at,
-                    content_photo=content.content_photo,
-                    view_count=content.view_count,
-                    commentarion_count=comments_count,
-                    shered_counts=shered_counts,
-                    like_count=len(content.liked_by),
-                )
+        response = [
+            schema.ContentSchema(
+                id=content.id,
+                author=schema.UserShema(
+                    id=content.author.id,
+                    username=str(content.author.username),
+                    profile_photo=str(content.author.profile_photo),
+                ),
+                content_title=content.content_title,
+                created_at=content.created_at,
+                content_photo=content.content_photo,
+                view_count=content.view_count,
+                commentarion_count=content.comment_count,
+                shered_counts=content.share_count,
+                like_count=content.like_count,
             )
+            for content in publications
+        ]
 
-        return response
+        return schema.ContentFeedPage(items=response, next_cursor=next_cursor)
 
     async def delete(
         self,
@@ -411,21 +397,20 @@ class MenoService:
         current_user: models.User,
     ):
 
-        model = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
             .filter(models.Content.id == content_id)
             .filter(models.Content.author_id == current_user.id)
-            .first()
         )
+        model = result.scalars().first()
 
         if not model:
             raise HTTPException(detail="Object not found", status_code=404)
 
-        file_path = os.path.join(IMAGEDIR, str(model.content_photo))
-        os.remove(file_path)
+        await image_store.release(self.session, model.content_photo)
 
-        self.session.delete(model)
-        self.session.commit()
+        await self.session.delete(model)
+        await self.session.commit()
 
         return "Deleted Succsesfully"
 
@@ -437,9 +422,7 @@ class MenoService:
         content_title: str = Form(...),
     ):
 
-        content = (
-            self.session.query(models.Content).filter(models.Content.id == id).first()
-        )
+        content = await self.session.get(models.Content, id)
 
         if not content:
             raise HTTPException(
@@ -452,7 +435,7 @@ class MenoService:
 
             content.content_for = content_for if content_for else None
 
-            self.session.commit()
+            await self.session.commit()
             return "Content Updated Succsesfully"
 
     async def get_intering_contents(
@@ -463,8 +446,9 @@ class MenoService:
 
         category_value = category.value
 
-        intersing_contens = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .filter(models.Content.content_for == category_value)
             .filter(
                 or_(
@@ -473,25 +457,14 @@ class MenoService:
                 )
             )
             .order_by(models.Content.created_at.desc())
-            .all()
         )
+        intersing_contens = result.scalars().all()
 
         if not intersing_contens:
             raise HTTPException(detail="Not found", status_code=404)
 
         response = []
         for content in intersing_contens:
-            comments_count = (
-                self.session.query(models.CommentarionModel)
-                .filter(models.CommentarionModel.content_id == content.id)
-                .count()
-            )
-            shered_counts = (
-                self.session.query(models.UserContent)
-                .filter(models.UserContent.content_id == content.id)
-                .count()
-            )
-
             response.append(
                 schema.ContentSchema(
                     id=content.id,
@@ -505,8 +478,9 @@ class MenoService:
                     content_photo=content.content_photo,
                     view_count=content.view_count,
                     profile_photo=content.author.profile_photo,
-                    commentarion_count=comments_count,
-                    shered_counts=shered_counts,
+                    like_count=content.like_count,
+                    commentarion_count=content.comment_count,
+                    shered_counts=content.share_count,
                 )
             )
 
@@ -518,26 +492,26 @@ class MenoService:
         current_user: models.User,
     ):
 
-        content = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
             .filter(models.Content.id == content_id)
             .filter(models.Content.author_id == current_user.id)
-            .first()
         )
+        content = result.scalars().first()
         if not content:
             raise HTTPException(detail="Not Found", status_code=404)
 
         if content.is_archived == True:
             content.is_archived = False
 
-            self.session.commit()
+            await self.session.commit()
 
             return "Content removed from archive"
 
         else:
             content.is_archived = True
 
-            self.session.commit()
+            await self.session.commit()
 
             return {
                 "detail": {
@@ -549,12 +523,13 @@ class MenoService:
         self, current_user: models.User
     ) -> List[schema.ContentSchema] | None:
 
-        archived_contents = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .filter(models.Content.author_id == current_user.id)
             .filter(models.Content.is_archived == True)
-            .all()
         )
+        archived_contents = result.scalars().all()
 
         response = [
             schema.ContentSchema(
@@ -566,10 +541,10 @@ class MenoService:
                     username=str(archived_content.author.username),
                     profile_photo=str(archived_content.author.profile_photo),
                 ),
-                like_count=len(archived_content.liked_by),
+                like_count=archived_content.like_count,
                 view_count=archived_content.view_count,
-                shered_counts=len(archived_content.user_contents),
-                commentarion_count=len(archived_content.commentarion),
+                shered_counts=archived_content.share_count,
+                commentarion_count=archived_content.comment_count,
                 created_at=archived_content.created_at,
             )
             for archived_content in archived_contents
@@ -578,15 +553,15 @@ class MenoService:
         return response
 
     async def get_likes_from_content(self, content_id: int, current_user: models.User):
-        query = (
-            self.session.query(models.User)
+        result = await self.session.execute(
+            select(models.User)
             .join(
                 models.content_likes, models.content_likes.c.user_id == models.User.id
             )
             .filter(models.content_likes.c.content_id == content_id)
         )
 
-        likes = query.all()
+        likes = result.scalars().all()
 
         if not likes:
             raise HTTPException(status_code=404, detail="Likes not found.")
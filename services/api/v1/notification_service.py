@@ -1,23 +1,31 @@
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import select
 from database import models
 from database import schema
+from .reels_processing import reels_media
 
 
 class NotificatiinService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     
 
     async def get_all_user_notification(self, current_user: models.User):
     # Получаем все уведомления для текущего пользователя, отсортированные по дате создания
-        notifications = (
-            self.session.query(models.Notification)
+        result = await self.session.execute(
+            select(models.Notification)
+            .options(
+                joinedload(models.Notification.content),
+                joinedload(models.Notification.sender),
+                joinedload(models.Notification.video_reels),
+            )
             .filter(models.Notification.user_id == current_user.id)
             .order_by(models.Notification.created_at.desc())
-            .all()
         )
+        notifications = result.scalars().all()
 
         # Если уведомлений нет, возвращаем пустой список
         if not notifications:
@@ -54,6 +62,7 @@ class NotificatiinService:
                 video_reels = schema.VideoReelsSchema(
 
                     id = video_reels.id,
+                    **reels_media(video_reels),
                     video_reels = video_reels.video_reels,
                     reels_title = video_reels.reels_title,
                     view_count = video_reels.view_count,
@@ -0,0 +1,48 @@
+from fastapi import HTTPException, status
+from datetime import datetime
+import base64
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _encode(*parts) -> str:
+    raw = "|".join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str, size: int) -> list[str]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    parts = base64.urlsafe_b64decode(padded).decode().split("|")
+    if len(parts) != size:
+        raise ValueError(cursor)
+    return parts
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    return _encode(created_at.isoformat(), id)
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, id = _decode(cursor, 2)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def encode_timeline_cursor(timestamp: datetime, kind: str, id: int) -> str:
+    return _encode(timestamp.isoformat(), kind, id)
+
+
+def decode_timeline_cursor(cursor: str) -> tuple[datetime, str, int]:
+    try:
+        timestamp, kind, id = _decode(cursor, 3)
+        return datetime.fromisoformat(timestamp), kind, int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
@@ -0,0 +1,388 @@
+from sqlalchemy import and_, or_, select, update
+from database.database import SessionLocal
+from database.models import Reels
+from config.settings import settings
+from datetime import datetime, timedelta
+from typing import Optional
+from .media_store import is_hashed, reels_store
+from .storage import storage
+import asyncio
+import hashlib
+import logging
+import shutil
+import struct
+import anyio
+import json
+import uuid
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+HLS_PREFIX = "reels/"
+
+# (name, short side, video bitrate, audio bitrate)
+HLS_RENDITIONS = (
+    ("240p", 240, "400k", "64k"),
+    ("480p", 480, "1000k", "96k"),
+    ("720p", 720, "2500k", "128k"),
+)
+
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+_processing_slots = asyncio.Semaphore(settings.reels_processing_concurrency)
+
+
+class ProcessingError(Exception):
+    pass
+
+
+async def _run(*args: str) -> bytes:
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise ProcessingError(
+            f"{os.path.basename(args[0])} exited with {process.returncode}: "
+            f"{stderr.decode(errors='replace')[-2000:]}"
+        )
+    return stdout
+
+
+async def probe(path: str) -> dict:
+    output = await _run(
+        settings.ffprobe_binary,
+        "-v", "error",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        path,
+    )
+    data = json.loads(output)
+    streams = data.get("streams", [])
+
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise ProcessingError(f"{path} has no video stream")
+
+    width, height = int(video["width"]), int(video["height"])
+    # Телефоны часто пишут вертикальное видео как горизонтальное с поворотом;
+    # ffmpeg поворачивает кадры при декодировании, поэтому меняем стороны местами
+    if abs(_rotation(video)) % 180 == 90:
+        width, height = height, width
+
+    return {
+        "width": width,
+        "height": height,
+        "duration": float(data.get("format", {}).get("duration") or 0),
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+    }
+
+
+def _rotation(stream: dict) -> int:
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            return int(side_data["rotation"])
+    return int(stream.get("tags", {}).get("rotate", 0))
+
+
+def rendition_ladder(width: int, height: int) -> list[tuple[str, str, str, str]]:
+    """(name, scale, video bitrate, audio bitrate) for each rendition of a width x height source.
+
+    Renditions are sized by the short side, so a portrait 1080x1920 video gets
+    720x1280 rather than 405x720, and the source is never upscaled: a source
+    smaller than the lowest rendition gets a single one at its own size.
+    """
+    short_side = min(width, height)
+    renditions = [r for r in HLS_RENDITIONS if r[1] <= short_side]
+    if not renditions:
+        # libx264 кодирует только чётные размеры
+        size = max(short_side - short_side % 2, 2)
+        _, _, video_bitrate, audio_bitrate = HLS_RENDITIONS[0]
+        renditions = [(f"{size}p", size, video_bitrate, audio_bitrate)]
+
+    return [
+        (name, f"{size}:-2" if height > width else f"-2:{size}", video_bitrate, audio_bitrate)
+        for name, size, video_bitrate, audio_bitrate in renditions
+    ]
+
+
+def hls_prefix(reels_id: int) -> str:
+    return f"{HLS_PREFIX}{reels_id}/"
+
+
+def playlist_url(reels: Reels) -> Optional[str]:
+    if reels.hls_status == "ready" and reels.hls_playlist:
+        return f"/reels-hls/{reels.hls_playlist}"
+    return None
+
+
+def reels_media(reels: Reels) -> dict:
+    return {
+        "playlist_url": playlist_url(reels),
+        "poster": reels.poster,
+        "duration": reels.duration,
+        "width": reels.width,
+        "height": reels.height,
+    }
+
+
+def _moov_before_mdat(path: str) -> bool:
+    with open(path, "rb") as file:
+        while True:
+            header = file.read(8)
+            if len(header) < 8:
+                return False
+
+            size, kind = struct.unpack(">I4s", header)
+            if kind == b"moov":
+                return True
+            if kind == b"mdat":
+                return False
+
+            if size == 1:
+                (size,) = struct.unpack(">Q", file.read(8))
+                size -= 16
+            elif size == 0:
+                return False
+            else:
+                size -= 8
+            file.seek(size, os.SEEK_CUR)
+
+
+async def faststart(source: str, target: str) -> bool:
+    """Write a copy of source with the moov atom in front of the media data to target.
+
+    Playback can then start before the whole file is downloaded. Returns False,
+    writing nothing, when source already has the moov atom there.
+    """
+    if await anyio.to_thread.run_sync(_moov_before_mdat, source):
+        return False
+
+    await _run(
+        settings.ffmpeg_binary, "-y", "-v", "error",
+        "-i", source,
+        "-map", "0",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        target,
+    )
+    return True
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(settings.media_upload_chunk_bytes):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def extract_poster(source: str, info: dict, poster: str):
+    # Первый кадр часто чёрный, берём кадр чуть дальше начала
+    offset = min(1.0, info["duration"] / 2)
+    await _run(
+        settings.ffmpeg_binary, "-y", "-v", "error",
+        "-ss", f"{offset:.3f}",
+        "-i", source,
+        "-frames:v", "1",
+        "-vf", f"scale=-2:'min({settings.reels_poster_height},ih)'",
+        "-q:v", "3",
+        poster,
+    )
+
+
+async def package_hls(source: str, info: dict, output_dir: str):
+    renditions = rendition_ladder(info["width"], info["height"])
+
+    split = f"[0:v]split={len(renditions)}" + "".join(f"[s{i}]" for i in range(len(renditions)))
+    scales = [f"[s{i}]scale={scale}[v{i}]" for i, (_, scale, _, _) in enumerate(renditions)]
+
+    args = [
+        settings.ffmpeg_binary, "-y", "-v", "error",
+        "-i", source,
+        "-filter_complex", ";".join([split, *scales]),
+    ]
+    stream_map = []
+    for i, (name, _, video_bitrate, audio_bitrate) in enumerate(renditions):
+        args += [
+            "-map", f"[v{i}]",
+            f"-c:v:{i}", "libx264",
+            f"-b:v:{i}", video_bitrate,
+            f"-maxrate:v:{i}", video_bitrate,
+            f"-bufsize:v:{i}", video_bitrate,
+        ]
+        if info["has_audio"]:
+            args += ["-map", "0:a:0", f"-c:a:{i}", "aac", f"-b:a:{i}", audio_bitrate]
+            stream_map.append(f"v:{i},a:{i},name:{name}")
+        else:
+            stream_map.append(f"v:{i},name:{name}")
+
+    segment_seconds = settings.hls_segment_seconds
+    args += [
+        "-preset", "veryfast",
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})",
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(output_dir, "%v", "segment_%03d.ts"),
+        "-master_pl_name", "master.m3u8",
+        "-var_stream_map", " ".join(stream_map),
+        os.path.join(output_dir, "%v", "index.m3u8"),
+    ]
+
+    await anyio.to_thread.run_sync(os.makedirs, output_dir)
+    await _run(*args)
+
+
+def _list_files(directory: str) -> list[str]:
+    return [
+        os.path.relpath(os.path.join(root, name), directory)
+        for root, _, names in os.walk(directory)
+        for name in names
+    ]
+
+
+async def publish_hls(reels_id: int, output_dir: str) -> str:
+    prefix = hls_prefix(reels_id)
+    await storage.delete_prefix(prefix)
+
+    # Плейлисты загружаем последними, чтобы они не ссылались на ещё не загруженные сегменты
+    files = await anyio.to_thread.run_sync(_list_files, output_dir)
+    for name in sorted(files, key=lambda name: name.endswith(".m3u8")):
+        await storage.put_file(
+            prefix + name.replace(os.sep, "/"),
+            os.path.join(output_dir, name),
+            HLS_MEDIA_TYPES[os.path.splitext(name)[1]],
+        )
+
+    return f"{reels_id}/master.m3u8"
+
+
+def _claimable():
+    # "processing" без движения дольше таймаута значит, что обработчик умер вместе с процессом
+    stale = datetime.utcnow() - timedelta(seconds=settings.reels_processing_timeout_seconds)
+    return or_(
+        Reels.hls_status == "pending",
+        and_(Reels.hls_status == "processing", Reels.hls_started_at < stale),
+    )
+
+
+async def process_reels(reels_id: int):
+    async with _processing_slots:
+        async with SessionLocal() as session:
+            # Забираем рилс атомарно, чтобы повторный запуск на другом воркере его пропустил
+            claimed = (
+                await session.execute(
+                    update(Reels)
+                    .where(Reels.id == reels_id, _claimable())
+                    .values(hls_status="processing", hls_started_at=datetime.utcnow())
+                    .returning(Reels.video_reels)
+                )
+            ).first()
+            await session.commit()
+            if claimed is None:
+                return
+
+            stored_name = claimed.video_reels
+
+            # ffmpeg работает только с локальными файлами, поэтому при удалённом
+            # хранилище исходник скачивается во временный каталог
+            work_dir = os.path.join(reels_store.scratch_dir, f".{reels_id}.{uuid.uuid4()}.work")
+            published = False
+            try:
+                await anyio.to_thread.run_sync(os.makedirs, work_dir)
+
+                source = reels_store.path(stored_name)
+                if source is None:
+                    source = os.path.join(work_dir, "source.mp4")
+                    await storage.download(reels_store.key(stored_name), source)
+
+                info = await probe(source)
+
+                # Исходный объект может быть общим для нескольких рилсов, поэтому
+                # перепакованный файл сохраняется как новый объект, а не поверх старого
+                video_name = stored_name
+                remuxed = os.path.join(work_dir, "faststart.mp4")
+                if await faststart(source, remuxed):
+                    source = remuxed
+                    if is_hashed(video_name):
+                        checksum = await anyio.to_thread.run_sync(_sha256_file, remuxed)
+                        video_name = f"{checksum}.mp4"
+
+                poster = f"{os.path.splitext(video_name)[0]}.jpg"
+                poster_path = os.path.join(work_dir, "poster.jpg")
+                await extract_poster(source, info, poster_path)
+
+                hls_dir = os.path.join(work_dir, "hls")
+                await package_hls(source, info, hls_dir)
+
+                # Рилс могли удалить, пока работал ffmpeg: тогда публиковать нечего
+                if await session.scalar(select(Reels.id).where(Reels.id == reels_id)) is None:
+                    return
+
+                # Новый объект и его постер при откате удалит media_store, HLS удаляем сами
+                published = True
+                if video_name != stored_name:
+                    size = await anyio.to_thread.run_sync(os.path.getsize, remuxed)
+                    await reels_store.put_file(session, remuxed, video_name, size)
+                elif source == remuxed:
+                    # Прямая загрузка принадлежит одному рилсу, её можно заменить на месте
+                    await storage.put_file(reels_store.key(video_name), remuxed, "video/mp4")
+                await storage.put_file(reels_store.key(poster), poster_path, "image/jpeg")
+                hls_playlist = await publish_hls(reels_id, hls_dir)
+
+                # Блокировка не даёт удалению рилса освободить старый объект одновременно с нами
+                reels = await session.scalar(
+                    select(Reels)
+                    .where(Reels.id == reels_id)
+                    .with_for_update()
+                    .execution_options(populate_existing=True)
+                )
+                if reels is None:
+                    raise LookupError(f"Reels {reels_id} was deleted during processing")
+
+                if video_name != stored_name:
+                    await reels_store.release(session, stored_name)
+                    reels.video_reels = video_name
+                    reels.checksum = os.path.splitext(video_name)[0]
+
+                reels.duration = info["duration"]
+                reels.width = info["width"]
+                reels.height = info["height"]
+                reels.hls_playlist = hls_playlist
+                reels.poster = poster
+                reels.hls_status = "ready"
+                await session.commit()
+            except Exception:
+                logger.exception("Packaging reels %s failed", reels_id)
+                await session.rollback()
+                if published:
+                    try:
+                        await storage.delete_prefix(hls_prefix(reels_id))
+                    except Exception:
+                        logger.exception("Failed to remove HLS renditions of reels %s", reels_id)
+
+                await session.execute(
+                    update(Reels).where(Reels.id == reels_id).values(hls_status="failed")
+                )
+                await session.commit()
+            finally:
+                await anyio.to_thread.run_sync(shutil.rmtree, work_dir, True)
+
+
+async def resume_reels_processing():
+    """Process reels whose background task was lost, for example to a restart."""
+    async with SessionLocal() as session:
+        reels_ids = (
+            await session.scalars(select(Reels.id).where(_claimable()).order_by(Reels.id))
+        ).all()
+
+    if reels_ids:
+        logger.info("Resuming processing of %s reels", len(reels_ids))
+    await asyncio.gather(*(process_reels(reels_id) for reels_id in reels_ids))
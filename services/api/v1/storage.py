@@ -0,0 +1,465 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+from config.settings import Settings, settings
+import aiofiles
+import aiofiles.os
+import hashlib
+import shutil
+import httpx
+import anyio
+import hmac
+import time
+import os
+
+
+class StorageError(Exception):
+    pass
+
+
+class Storage(ABC):
+    """Where media bytes live, addressed by slash-separated keys such as images/ab/cd/<hash>.jpg."""
+
+    backend = "storage"
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of `key` when the backend is a local disk, otherwise None."""
+        return None
+
+    @abstractmethod
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    async def put_file(self, key: str, path: str, content_type: Optional[str] = None):
+        """Store a local file under `key`; the file is consumed."""
+
+    @abstractmethod
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def download(self, key: str, path: str):
+        ...
+
+    @abstractmethod
+    async def size(self, key: str) -> Optional[int]:
+        """Size of the object in bytes, or None if it does not exist."""
+
+    @abstractmethod
+    async def read_range(self, key: str, start: int, end: int) -> bytes:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str):
+        ...
+
+    @abstractmethod
+    def presigned_get_url(self, key: str, expires_in: int, now: Optional[datetime] = None) -> str:
+        ...
+
+    @abstractmethod
+    def presigned_put_url(self, key: str, expires_in: int) -> str:
+        ...
+
+    def public_url(self, key: str) -> Optional[str]:
+        """Unsigned URL of `key` when the storage is served publicly (e.g. through a CDN)."""
+        return None
+
+
+class LocalStorage(Storage):
+    """Keys map to files under `root`.
+
+    Pre-signed URLs point back at this app's /storage/ routes and carry an
+    HMAC of method, key and expiry, so clients use the same direct-transfer
+    flow as with object storage. The secret must not be shared with anything
+    else, such as the JWT key.
+    """
+
+    backend = "local"
+
+    def __init__(self, root: str, secret: Optional[str], base_url: str = ""):
+        self.root = root
+        self.secret = secret.encode() if secret else None
+        self.base_url = base_url.rstrip("/")
+
+
+    def local_path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if os.path.relpath(path, self.root).startswith(".."):
+            raise StorageError(f"Key {key!r} escapes the storage root")
+        return path
+
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None):
+        path = self.local_path(key)
+        temp_path = f"{path}.part"
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        async with aiofiles.open(temp_path, "wb") as out:
+            await out.write(data)
+        await aiofiles.os.replace(temp_path, path)
+
+    async def put_file(self, key: str, path: str, content_type: Optional[str] = None):
+        target = self.local_path(key)
+        await aiofiles.os.makedirs(os.path.dirname(target), exist_ok=True)
+        await aiofiles.os.replace(path, target)
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            async with aiofiles.open(self.local_path(key), "rb") as file:
+                return await file.read()
+        except FileNotFoundError:
+            return None
+
+    async def download(self, key: str, path: str):
+        await anyio.to_thread.run_sync(shutil.copyfile, self.local_path(key), path)
+
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return (await aiofiles.os.stat(self.local_path(key))).st_size
+        except FileNotFoundError:
+            return None
+
+    async def read_range(self, key: str, start: int, end: int) -> bytes:
+        async with aiofiles.open(self.local_path(key), "rb") as file:
+            await file.seek(start)
+            return await file.read(end - start + 1)
+
+    async def delete(self, key: str):
+        try:
+            await aiofiles.os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    async def delete_prefix(self, prefix: str):
+        await anyio.to_thread.run_sync(shutil.rmtree, self.local_path(prefix), True)
+
+    def signature(self, method: str, key: str, expires: int) -> str:
+        if self.secret is None:
+            raise StorageError("STORAGE_SIGNING_SECRET must be set to sign local storage URLs")
+        message = f"{method}\n{key}\n{expires}".encode()
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def verify(self, method: str, key: str, expires: int, signature: str) -> bool:
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self.signature(method, key, expires), signature)
+
+    def _presign(
+        self, method: str, key: str, expires_in: int, now: Optional[datetime] = None
+    ) -> str:
+        expires = int(now.timestamp() if now else time.time()) + expires_in
+        signature = self.signature(method, key, expires)
+        return f"{self.base_url}/storage/{quote(key)}?expires={expires}&signature={signature}"
+
+    def presigned_get_url(self, key: str, expires_in: int, now: Optional[datetime] = None) -> str:
+        return self._presign("GET", key, expires_in, now)
+
+    def presigned_put_url(self, key: str, expires_in: int) -> str:
+        return self._presign("PUT", key, expires_in)
+
+
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+EMPTY_PAYLOAD_HASH = hashlib.sha256(b"").hexdigest()
+S3_NAMESPACE = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _canonical_query(query: dict[str, str]) -> str:
+    return "&".join(
+        f"{_uri_encode(name)}={_uri_encode(value)}" for name, value in sorted(query.items())
+    )
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+class S3Storage(Storage):
+    """S3-compatible object storage (AWS S3, MinIO, ...) signed with AWS Signature V4.
+
+    Requests go through a shared httpx client, and the signing is done here
+    rather than through an SDK.
+    """
+
+    backend = "s3"
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key_id: str,
+        secret_access_key: str,
+        region: str = "us-east-1",
+        addressing_style: str = "path",
+        public_base_url: Optional[str] = None,
+        timeout: float = 60,
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.region = region
+        self.addressing_style = addressing_style
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(timeout=self.timeout)
+
+    async def stop(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _location(self, key: str) -> tuple[str, str, str]:
+        """Return (base url, host, canonical URI) for `key`."""
+        endpoint = urlsplit(self.endpoint_url)
+        path = "/" + _uri_encode(key, safe="-_.~/") if key else ""
+
+        if self.addressing_style == "virtual":
+            host = f"{self.bucket}.{endpoint.netloc}"
+            return f"{endpoint.scheme}://{host}", host, path or "/"
+
+        return self.endpoint_url, endpoint.netloc, f"/{self.bucket}{path}"
+
+    def _signing_key(self, datestamp: str) -> bytes:
+        key = _hmac(f"AWS4{self.secret_access_key}".encode(), datestamp)
+        key = _hmac(key, self.region)
+        key = _hmac(key, "s3")
+        return _hmac(key, "aws4_request")
+
+    def _signature(
+        self,
+        method: str,
+        uri: str,
+        query: dict[str, str],
+        headers: dict[str, str],
+        payload_hash: str,
+        amz_date: str,
+    ) -> tuple[str, str, str]:
+        """Return (credential scope, signed headers, signature) for a request."""
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+
+        canonical_headers = {name.lower(): " ".join(value.split()) for name, value in headers.items()}
+        signed_headers = ";".join(sorted(canonical_headers))
+
+        canonical_request = "\n".join([
+            method,
+            uri,
+            _canonical_query(query),
+            "".join(f"{name}:{canonical_headers[name]}\n" for name in sorted(canonical_headers)),
+            signed_headers,
+            payload_hash,
+        ])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        signature = hmac.new(
+            self._signing_key(datestamp), string_to_sign.encode(), hashlib.sha256
+        ).hexdigest()
+
+        return scope, signed_headers, signature
+
+    def presign(
+        self, method: str, key: str, expires_in: int, now: Optional[datetime] = None
+    ) -> str:
+        base, host, uri = self._location(key)
+        amz_date = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key_id}/{amz_date[:8]}/{self.region}/s3/aws4_request",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": "host",
+        }
+        _, _, signature = self._signature(
+            method, uri, query, {"host": host}, UNSIGNED_PAYLOAD, amz_date
+        )
+
+        query_string = "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in query.items())
+        return f"{base}{uri}?{query_string}&X-Amz-Signature={signature}"
+
+    def presigned_get_url(self, key: str, expires_in: int, now: Optional[datetime] = None) -> str:
+        return self.presign("GET", key, expires_in, now)
+
+    def presigned_put_url(self, key: str, expires_in: int) -> str:
+        return self.presign("PUT", key, expires_in)
+
+    def public_url(self, key: str) -> Optional[str]:
+        if not self.public_base_url:
+            return None
+        return f"{self.public_base_url}/{_uri_encode(key, safe='-_.~/')}"
+
+    def sign_headers(
+        self,
+        method: str,
+        key: str,
+        headers: dict[str, str],
+        payload_hash: str,
+        query: Optional[dict[str, str]] = None,
+        now: Optional[datetime] = None,
+    ) -> dict[str, str]:
+        _, host, uri = self._location(key)
+        amz_date = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+
+        headers = {
+            **headers,
+            "host": host,
+            "x-amz-content-sha256": payload_hash,
+            "x-amz-date": amz_date,
+        }
+        scope, signed_headers, signature = self._signature(
+            method, uri, query or {}, headers, payload_hash, amz_date
+        )
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key_id}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        return headers
+
+    async def _request(
+        self,
+        method: str,
+        key: str,
+        headers: Optional[dict[str, str]] = None,
+        content=None,
+        payload_hash: str = EMPTY_PAYLOAD_HASH,
+        query: Optional[dict[str, str]] = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        base, _, uri = self._location(key)
+        signed = self.sign_headers(method, key, headers or {}, payload_hash, query)
+        # httpx сам выставит Host; подписанное значение совпадает
+        signed.pop("host")
+
+        url = f"{base}{uri}"
+        if query:
+            url = f"{url}?{_canonical_query(query)}"
+
+        request = self.client.build_request(method, url, headers=signed, content=content)
+        return await self.client.send(request, stream=stream)
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response, key: str):
+        if response.status_code >= 300:
+            raise StorageError(
+                f"S3 {response.request.method} {key} failed with {response.status_code}: "
+                f"{response.text[:500]}"
+            )
+
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None):
+        headers = {"content-type": content_type} if content_type else {}
+        response = await self._request(
+            "PUT", key, headers, data, hashlib.sha256(data).hexdigest()
+        )
+        self._raise_for_status(response, key)
+
+    async def put_file(self, key: str, path: str, content_type: Optional[str] = None):
+        size = (await aiofiles.os.stat(path)).st_size
+        headers = {"content-length": str(size)}
+        if content_type:
+            headers["content-type"] = content_type
+
+        async def body() -> AsyncIterator[bytes]:
+            async with aiofiles.open(path, "rb") as file:
+                while chunk := await file.read(settings.media_upload_chunk_bytes):
+                    yield chunk
+
+        response = await self._request("PUT", key, headers, body(), UNSIGNED_PAYLOAD)
+        self._raise_for_status(response, key)
+        await aiofiles.os.remove(path)
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        response = await self._request("GET", key)
+        if response.status_code == 404:
+            return None
+        self._raise_for_status(response, key)
+        return response.content
+
+    async def download(self, key: str, path: str):
+        response = await self._request("GET", key, stream=True)
+        try:
+            if response.status_code >= 300:
+                await response.aread()
+                self._raise_for_status(response, key)
+
+            async with aiofiles.open(path, "wb") as out:
+                async for chunk in response.aiter_bytes(settings.media_upload_chunk_bytes):
+                    await out.write(chunk)
+        finally:
+            await response.aclose()
+
+    async def size(self, key: str) -> Optional[int]:
+        response = await self._request("HEAD", key)
+        if response.status_code == 404:
+            return None
+        self._raise_for_status(response, key)
+        return int(response.headers["content-length"])
+
+    async def read_range(self, key: str, start: int, end: int) -> bytes:
+        response = await self._request("GET", key, {"range": f"bytes={start}-{end}"})
+        self._raise_for_status(response, key)
+        return response.content
+
+    async def delete(self, key: str):
+        response = await self._request("DELETE", key)
+        if response.status_code != 404:
+            self._raise_for_status(response, key)
+
+    async def delete_prefix(self, prefix: str):
+        query = {"list-type": "2", "prefix": prefix}
+        while True:
+            response = await self._request("GET", "", query=query)
+            self._raise_for_status(response, prefix)
+
+            listing = ElementTree.fromstring(response.content)
+            for item in listing.iter(f"{S3_NAMESPACE}Key"):
+                await self.delete(item.text)
+
+            token = listing.findtext(f"{S3_NAMESPACE}NextContinuationToken")
+            if not token:
+                return
+            query = {**query, "continuation-token": token}
+
+
+def create_storage_from_settings(settings: Settings) -> Storage:
+    if settings.storage_backend == "s3":
+        return S3Storage(
+            endpoint_url=settings.s3_endpoint_url,
+            bucket=settings.s3_bucket,
+            access_key_id=settings.s3_access_key_id,
+            secret_access_key=settings.s3_secret_access_key,
+            region=settings.s3_region,
+            addressing_style=settings.s3_addressing_style,
+            public_base_url=settings.s3_public_base_url,
+        )
+    return LocalStorage(
+        settings.storage_local_root,
+        secret=settings.storage_signing_secret,
+        base_url=settings.storage_public_base_url,
+    )
+
+
+storage = create_storage_from_settings(settings)
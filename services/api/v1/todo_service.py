@@ -1,17 +1,17 @@
 from fastapi import APIRouter, File, UploadFile, Depends, Form, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from authentication.oauth import get_current_user
 from database import models, database, schema
-import os
-import uuid
+from .media_ingestion import store_image
+from .media_store import image_store
 from datetime import datetime
 
 
-IMAGEDIR = "media/images/"
 
 
 class ToDoService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create_todo(
@@ -20,25 +20,20 @@ class ToDoService:
         title: str = Form(...),
         file: UploadFile = File(None),
     ):
+        stored = None
         if file is not None:
-
-            file.filename = f"{uuid.uuid4()}.jpg"
-            contents = await file.read()
-
-            file_path = os.path.join(IMAGEDIR, file.filename)
-            with open(file_path, "wb") as f:
-                f.write(contents)
+            stored = await store_image(self.session, file)
 
         new_todo_obj = models.UserToDo(
             title=title,
             user_id=current_user.id,
             # user = current_user.username,
-            file=file.filename if file else None,
+            file=stored.filename if stored else None,
             created_at=datetime.utcnow(),
         )
 
         self.session.add(new_todo_obj)
-        self.session.commit()
+        await self.session.commit()
 
         return new_todo_obj
 
@@ -47,12 +42,12 @@ class ToDoService:
         current_user: models.User,
     ):
 
-        todo_objs = (
-            self.session.query(models.UserToDo)
+        result = await self.session.execute(
+            select(models.UserToDo)
             .filter(models.UserToDo.user_id == current_user.id)
             .order_by(models.UserToDo.created_at.desc())
-            .all()
         )
+        todo_objs = result.scalars().all()
 
         if not todo_objs:
             raise HTTPException(status_code=404, detail="You don't have any todos")
@@ -76,15 +71,14 @@ class ToDoService:
         current_user: models.User,
     ):
 
-        todo = (
-            self.session.query(models.UserToDo).filter(models.UserToDo.id == id).first()
-        )
+        todo = await self.session.get(models.UserToDo, id)
 
         if todo:
             if current_user.id == todo.user_id:
 
-                self.session.delete(todo)
-                self.session.commit()
+                await image_store.release(self.session, todo.file)
+                await self.session.delete(todo)
+                await self.session.commit()
 
                 return "Todo Deleted Succsesfully"
 
@@ -98,9 +92,7 @@ class ToDoService:
         title: str = Form(...),
     ):
 
-        todo_model = (
-            self.session.query(models.UserToDo).filter(models.UserToDo.id == id).first()
-        )
+        todo_model = await self.session.get(models.UserToDo, id)
 
         if not todo_model:
             raise HTTPException(detail="Not Dound", status_code=404)
@@ -109,7 +101,7 @@ class ToDoService:
 
             todo_model.title = title
 
-            self.session.commit()
+            await self.session.commit()
 
             return "Updated Succsesfully"
 
@@ -1,19 +1,20 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from database import models, schema
 from authentication.hash import Hash
 from fastapi import File, UploadFile, Form, HTTPException
-import uuid
-import os
-from sqlalchemy import or_
+from sqlalchemy import or_, select, insert, func
 from fastapi.responses import FileResponse
 from typing import List
+from .reels_processing import reels_media
+from .media_ingestion import store_image
+from .media_store import image_store
 
-IMAGEDIR = "media/images/"
 
 
 class UserService:
 
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create_new_user(
@@ -24,27 +25,20 @@ class UserService:
         file: UploadFile = File(...),
     ):
 
-        file.filename = f"{uuid.uuid4()}.jpg"
-        contents = await file.read()
-
-        file_path = os.path.join(IMAGEDIR, file.filename)
-        with open(file_path, "wb") as f:
-            f.write(contents)
-
-        exist_username = (
-            self.session.query(models.User)
-            .filter(models.User.username == username)
-            .first()
+        result = await self.session.execute(
+            select(models.User).filter(models.User.username == username)
         )
+        exist_username = result.scalars().first()
         if exist_username:
             raise HTTPException(detail=f"{username} already exists", status_code=400)
 
         if len(username) < 5:
             raise HTTPException(detail="Username too short", status_code=422)
 
-        exist_email = (
-            self.session.query(models.User).filter(models.User.email == email).first()
+        result = await self.session.execute(
+            select(models.User).filter(models.User.email == email)
         )
+        exist_email = result.scalars().first()
         if exist_email:
             raise HTTPException(detail=f"{email} already exists", status_code=400)
 
@@ -58,16 +52,18 @@ class UserService:
 
         hashed_password = Hash.bcrypt(password)
 
+        stored = await store_image(self.session, file)
+
         new_user = models.User(
             username=username,
             email=email,
             password=hashed_password,
-            profile_photo=file.filename,
+            profile_photo=stored.filename,
         )
 
         self.session.add(new_user)
-        self.session.commit()
-        self.session.refresh(new_user)
+        await self.session.commit()
+        await self.session.refresh(new_user)
 
         return new_user
 
@@ -81,12 +77,13 @@ class UserService:
 
         category_value = content_category.value
 
-        user = self.session.query(models.User).filter(models.User.id == user_id).first()
+        user = await self.session.get(models.User, user_id)
         if not user:
             raise HTTPException(detail="Not Found", status_code=404)
 
-        contents = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .filter(models.Content.author_id == user_id)
             .filter(
                 or_(
@@ -95,16 +92,17 @@ class UserService:
                 )
             )
             .order_by(models.Content.created_at.desc())
-            .all()
         )
+        contents = result.scalars().all()
 
-        get_content_by_category = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .filter(models.Content.author_id == user_id)
             .filter(models.Content.content_for == category_value)
             .order_by(models.Content.created_at.desc())
-            .all()
         )
+        get_content_by_category = result.scalars().all()
 
         content_category_response = [
             schema.ContentSchema(
@@ -116,8 +114,8 @@ class UserService:
                 ),
                 content_photo=category_content.content_photo,
                 content_title=category_content.content_title,
-                commentarion_count=len(category_content.commentarion),
-                like_count=len(category_content.liked_by),
+                commentarion_count=category_content.comment_count,
+                like_count=category_content.like_count,
                 view_count=category_content.view_count,
                 created_at=category_content.created_at,
             )
@@ -134,15 +132,16 @@ class UserService:
                     username=str(content.author.username),
                     profile_photo=str(content.author.profile_photo),
                 ),
-                like_count=len(content.liked_by),
-                commentarion_count=len(content.commentarion),
+                like_count=content.like_count,
+                commentarion_count=content.comment_count,
                 created_at=content.created_at,
             )
             for content in contents
         ]
 
-        user_histories = (
-            self.session.query(models.History)
+        result = await self.session.execute(
+            select(models.History)
+            .options(joinedload(models.History.author))
             .filter(models.History.author_id == user_id)
             .order_by(models.History.created_at.desc())
             .filter(
@@ -151,8 +150,8 @@ class UserService:
                     models.Content.is_archived == None,
                 )
             )
-            .all()
         )
+        user_histories = result.scalars().all()
 
         history_response = [
             schema.HistoryResponse(
@@ -169,16 +168,18 @@ class UserService:
             for history in user_histories
         ]
 
-        video_reels = (
-            self.session.query(models.Reels)
+        result = await self.session.execute(
+            select(models.Reels)
+            .options(joinedload(models.Reels.user))
             .filter(models.Reels.user_id == user_id)
             .order_by(models.Reels.created_at.desc())
-            .all()
         )
+        video_reels = result.scalars().all()
 
         video_reels_response = [
             schema.VideoReelsSchema(
                 id=reels.id,
+                **reels_media(reels),
                 video_reels=reels.video_reels,
                 reels_title=reels.reels_title,
                 user=schema.UserShema(
@@ -186,7 +187,7 @@ class UserService:
                     username=str(reels.user.username),
                     profile_photo=str(reels.user.profile_photo),
                 ),
-                like_count=len(reels.liked_by),
+                like_count=reels.like_count,
                 created_at=reels.created_at,
                 view_count=reels.view_count,
                 place=reels.place,
@@ -194,22 +195,20 @@ class UserService:
             for reels in video_reels
         ]
 
-        who_followed_user_count = (
-            self.session.query(models.User)
+        who_followed_user_count = await self.session.scalar(
+            select(func.count(models.User.id))
             .join(
                 models.subscription, models.subscription.c.followed_id == models.User.id
             )
             .filter(models.subscription.c.follower_id == user_id)
-            .count()
         )
 
-        followers_user_count = (
-            self.session.query(models.User)
+        followers_user_count = await self.session.scalar(
+            select(func.count(models.User.id))
             .join(
                 models.subscription, models.subscription.c.follower_id == models.User.id
             )
             .filter(models.subscription.c.followed_id == user_id)
-            .count()
         )
 
         user_response = schema.UserShemaForContent(
@@ -241,40 +240,29 @@ class UserService:
         biography: str = Form(None),
         file: UploadFile = File(None)
     ):
-        
-        if file is not None:
-            
-        
-            file.filename = f"{uuid.uuid4()}.jpg"
-            contents = await file.read()
-
-            file_path = os.path.join(IMAGEDIR, file.filename)
-            with open(file_path, "wb") as f:
-                f.write(contents)
 
-        file_path = os.path.join(IMAGEDIR, str(current_user.profile_photo))
-        os.remove(file_path)
-
-        exist_username = (
-            self.session.query(models.User)
-            .filter(models.User.username == username)
-            .first()
+        result = await self.session.execute(
+            select(models.User).filter(models.User.username == username)
         )
+        exist_username = result.scalars().first()
 
         if exist_username:
             raise HTTPException(detail="Username already exists", status_code=409)
 
+        if len(username) < 4:
+            raise HTTPException(detail="Username Most Small", status_code=402)
+
+        if file is not None:
+            stored = await store_image(self.session, file)
+            await image_store.release(self.session, current_user.profile_photo)
+            current_user.profile_photo = stored.filename
+
         current_user.username = username
         current_user.name = name
         current_user.surname = surname
         current_user.bigraph = biography
-        current_user.profile_photo = file.filename if file.filename else None
 
-        if len(username) < 4:
-            raise HTTPException(detail="Username Most Small", status_code=402)
-
-        self.session.commit()
-        self.session.refresh(current_user)
+        await self.session.commit()
 
         return schema.UserUpdateResponse(
             id=current_user.id,
@@ -290,20 +278,29 @@ class UserService:
         if current_user.id == user_id:
             raise HTTPException(status_code=400, detail="You cannot follow yourself.")
 
-        user_to_follow = (
-            self.session.query(models.User).filter(models.User.id == user_id).first()
-        )
+        user_to_follow = await self.session.get(models.User, user_id)
         if not user_to_follow:
             raise HTTPException(status_code=404, detail="User not found.")
 
-        if user_to_follow in current_user.followed_by:
+        is_following = await self.session.scalar(
+            select(models.subscription.c.followed_id).filter(
+                models.subscription.c.follower_id == current_user.id,
+                models.subscription.c.followed_id == user_id,
+            )
+        )
+
+        if is_following:
 
             raise HTTPException(
                 status_code=400, detail="You are already following this user."
             )
 
-        current_user.followed_by.append(user_to_follow)
-        self.session.commit()
+        await self.session.execute(
+            insert(models.subscription).values(
+                follower_id=current_user.id, followed_id=user_id
+            )
+        )
+        await self.session.commit()
 
         return {"message": "You have successfully followed the user."}
 
@@ -312,27 +309,26 @@ class UserService:
         if current_user.id == id:
             raise HTTPException(status_code=400, detail="You cannot unfollow yourself.")
 
-        user_to_unfollow = (
-            self.session.query(models.User).filter(models.User.id == id).first()
-        )
+        user_to_unfollow = await self.session.get(models.User, id)
         if not user_to_unfollow:
             raise HTTPException(status_code=404, detail="User not found.")
 
-        existing_subscription = self.session.execute(
+        result = await self.session.execute(
             models.subscription.select().where(
                 models.subscription.c.follower_id == current_user.id,
                 models.subscription.c.followed_id == id,
             )
-        ).fetchone()
+        )
+        existing_subscription = result.fetchone()
 
         if existing_subscription:
-            self.session.execute(
+            await self.session.execute(
                 models.subscription.delete().where(
                     models.subscription.c.follower_id == current_user.id,
                     models.subscription.c.followed_id == id,
                 )
             )
-            self.session.commit()
+            await self.session.commit()
             return {"message": "Successfully unfollowed the user."}
         else:
             raise HTTPException(
@@ -341,19 +337,21 @@ class UserService:
 
     async def get_subscribed_content(self, current_user: models.User):
 
-        followed_ids = (
-            self.session.query(models.subscription.c.followed_id)
-            .filter(models.subscription.c.follower_id == current_user.id)
-            .all()
+        result = await self.session.execute(
+            select(models.subscription.c.followed_id).filter(
+                models.subscription.c.follower_id == current_user.id
+            )
         )
+        followed_ids = result.all()
 
         followed_ids = [followed_id for (followed_id,) in followed_ids]
 
         if not followed_ids:
             raise HTTPException(status_code=404, detail="You are not following anyone")
 
-        content = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .filter(models.Content.author_id.in_(followed_ids))
             .filter(
                 or_(
@@ -361,8 +359,8 @@ class UserService:
                     models.Content.is_archived == None,
                 )
             )
-            .all()
         )
+        content = result.scalars().all()
 
         if not content:
             raise HTTPException(
@@ -371,11 +369,7 @@ class UserService:
 
         content_response = []
         for item in content:
-            author = (
-                self.session.query(models.User)
-                .filter(models.User.id == item.author_id)
-                .first()
-            )
+            author = await self.session.get(models.User, item.author_id)
             if not author:
                 continue
 
@@ -390,11 +384,11 @@ class UserService:
                         username=str(item.author.username),
                     ),
                     created_at=item.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                    like_count=len(item.liked_by),
+                    like_count=item.like_count,
                     liked_by=[],
                     profile_photo=author.profile_photo,
                     view_count=item.view_count,
-                    commentarion_count=len(item.commentarion),
+                    commentarion_count=item.comment_count,
                 )
             )
 
@@ -402,14 +396,14 @@ class UserService:
 
     async def get_followers_users(self, user_id: int, current_user: models.User):
 
-        following_users = (
-            self.session.query(models.User)
+        result = await self.session.execute(
+            select(models.User)
             .join(
                 models.subscription, models.subscription.c.followed_id == models.User.id
             )
             .filter(models.subscription.c.follower_id == user_id)
-            .all()
         )
+        following_users = result.scalars().all()
 
         if not following_users:
             raise HTTPException(status_code=404, detail="You are not following anyone")
@@ -427,17 +421,19 @@ class UserService:
         return following_response
 
     async def get_user_chosen_contents(self, current_user: models.User):
-        chosen_content_ids = (
-            self.session.query(models.chosen.c.content_id)
-            .filter(models.chosen.c.user_id == current_user.id)
-            .all()
+        result = await self.session.execute(
+            select(models.chosen.c.content_id).filter(
+                models.chosen.c.user_id == current_user.id
+            )
         )
+        chosen_content_ids = result.all()
 
         if not chosen_content_ids:
             return []
 
-        liked_contents = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .filter(
                 models.Content.id.in_(
                     [content_id[0] for content_id in chosen_content_ids]
@@ -449,8 +445,8 @@ class UserService:
                     models.Content.is_archived == None,
                 )
             )
-            .all()
         )
+        liked_contents = result.scalars().all()
 
         response_data = [
             schema.ContentSchema(
@@ -475,18 +471,18 @@ class UserService:
     ) -> List[schema.UserShema]:
 
         if username:
-            query = (
-                self.session.query(models.User)
-                .filter(models.User.username.ilike(f"%{username}%"))
-                .all()
+            result = await self.session.execute(
+                select(models.User).filter(models.User.username.ilike(f"%{username}%"))
             )
+            query = result.scalars().all()
 
         return query
 
     async def user_me(self, current_user: models.User):
 
-        user_contents = (
-            self.session.query(models.Content)
+        result = await self.session.execute(
+            select(models.Content)
+            .options(joinedload(models.Content.author))
             .filter(models.Content.author_id == current_user.id)
             .order_by(models.Content.created_at.desc())
             .filter(
@@ -495,43 +491,46 @@ class UserService:
                     models.Content.is_archived == None,
                 )
             )
-            .all()
         )
+        user_contents = result.scalars().all()
 
-        historys = (
-            self.session.query(models.History)
+        result = await self.session.execute(
+            select(models.History)
+            .options(
+                joinedload(models.History.author),
+                selectinload(models.History.liked_by),
+            )
             .filter(models.History.author_id == current_user.id)
             .order_by(models.History.created_at.desc())
-            .all()
         )
+        historys = result.scalars().all()
 
-        video_reels = (
-            self.session.query(models.Reels)
+        result = await self.session.execute(
+            select(models.Reels)
+            .options(joinedload(models.Reels.user))
             .filter(models.Reels.user_id == current_user.id)
             .filter(
                 or_(models.Reels.is_archived != True, models.Reels.is_archived == None)
             )
             .order_by(models.Reels.created_at.desc())
-            .all()
         )
+        video_reels = result.scalars().all()
 
 
-        who_followed_user_count = (
-            self.session.query(models.User)
+        who_followed_user_count = await self.session.scalar(
+            select(func.count(models.User.id))
             .join(
                 models.subscription, models.subscription.c.followed_id == models.User.id
             )
             .filter(models.subscription.c.follower_id == current_user.id)
-            .count()
         )
 
-        followers_user_count = (
-            self.session.query(models.User)
+        followers_user_count = await self.session.scalar(
+            select(func.count(models.User.id))
             .join(
                 models.subscription, models.subscription.c.follower_id == models.User.id
             )
             .filter(models.subscription.c.followed_id == current_user.id)
-            .count()
         )
 
         history_response = [
@@ -551,8 +550,8 @@ class UserService:
         ]
 
         content_count = len(user_contents) + len(video_reels)
-        followers_count = len(current_user.following)
-        history_count = len(current_user.histories)
+        followers_count = followers_user_count
+        history_count = len(historys)
 
         content_response = [
             schema.ContentSchema(
@@ -566,7 +565,7 @@ class UserService:
                 ),
                 created_at=user_content.created_at,
                 profile_photo=str(user_content.author.profile_photo),
-                like_count=len(user_content.liked_by),
+                like_count=user_content.like_count,
                 view_count=user_content.view_count,
             )
             for user_content in user_contents
@@ -575,6 +574,7 @@ class UserService:
         video_reels_response = [
             schema.VideoReelsSchema(
                 id=reels.id,
+                **reels_media(reels),
                 reels_title=reels.reels_title,
                 video_reels=reels.video_reels,
                 user=schema.UserShema(
@@ -583,7 +583,7 @@ class UserService:
                     profile_photo=str(reels.user.profile_photo),
                 ),
                 created_at=reels.created_at,
-                like_count=len(reels.liked_by),
+                like_count=reels.like_count,
                 view_count=reels.view_count,
             )
             for reels in video_reels
@@ -610,14 +610,14 @@ class UserService:
 
     async def get_following_users(self, user_id: int, current_user: models.User):
 
-        following_users = (
-            self.session.query(models.User)
+        result = await self.session.execute(
+            select(models.User)
             .join(
                 models.subscription, models.subscription.c.followed_id == models.User.id
             )
             .filter(models.subscription.c.follower_id == user_id)
-            .all()
         )
+        following_users = result.scalars().all()
 
         if not following_users:
             raise HTTPException(status_code=404, detail="You are not following anyone")
@@ -636,22 +636,27 @@ class UserService:
 
     async def get_subscribed_history(self, current_user: models.User):
 
-        followed_ids = (
-            self.session.query(models.subscription.c.followed_id)
-            .filter(models.subscription.c.follower_id == current_user.id)
-            .all()
+        result = await self.session.execute(
+            select(models.subscription.c.followed_id).filter(
+                models.subscription.c.follower_id == current_user.id
+            )
         )
+        followed_ids = result.all()
 
         followed_ids = [followed_id for (followed_id,) in followed_ids]
 
         if not followed_ids:
             raise HTTPException(status_code=404, detail="You are not following anyone")
 
-        history = (
-            self.session.query(models.History)
+        result = await self.session.execute(
+            select(models.History)
+            .options(
+                joinedload(models.History.author),
+                selectinload(models.History.liked_by),
+            )
             .filter(models.History.author_id.in_(followed_ids))
-            .all()
         )
+        history = result.scalars().all()
 
         if not history:
             raise HTTPException(
@@ -659,11 +664,7 @@ class UserService:
             )
 
         for item in history:
-            author = (
-                self.session.query(models.User)
-                .filter(models.User.id == item.author_id)
-                .first()
-            )
+            author = await self.session.get(models.User, item.author_id)
             if not author:
                 continue
 
@@ -689,19 +690,19 @@ class UserService:
         if current_user.is_closed == True:
             current_user.is_closed = False
 
-            self.session.commit()
+            await self.session.commit()
 
             return "Opened"
 
         else:
             current_user.is_closed = True
 
-            self.session.commit()
+            await self.session.commit()
             return "Is Closed"
 
     async def update_password(
         self,
-        session: Session,
+        session: AsyncSession,
         current_user: models.User,
         old_password: str = Form(...),
         new_password: str = Form(...),
@@ -716,6 +717,6 @@ class UserService:
         current_user.password = hashed_password
 
         session.add(current_user)
-        session.commit()
+        await session.commit()
 
         return {"message": "Your password was updated successfully."}
\ No newline at end of file
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from database.models import View, Reels, User
 from authentication.oauth import get_current_user
 from database.database import get_db
@@ -8,7 +9,15 @@ from datetime import datetime
 import uuid, os
 from typing import List
 import logging
-from sqlalchemy import or_
+from sqlalchemy import or_, select, delete
+from sqlalchemy.dialects.postgresql import insert
+from .view_tracking import view_buffer
+from .media_ingestion import VIDEO_TYPES, sniff_media_type, stream_upload_to_file
+from .reels_processing import hls_prefix, reels_media, process_reels
+from .media_store import reels_store
+from .storage import StorageError, storage
+from config.settings import settings
+import re
 
 
 logger = logging.getLogger(__name__)
@@ -16,11 +25,11 @@ logger = logging.getLogger(__name__)
 
 video_reels_router = APIRouter(tags=["Video Reels"])
 
-MEDIA_ROOT = "media/reels/"
+DIRECT_UPLOAD_NAME = re.compile(r"^(\d+)-[0-9a-f]{32}\.mp4$")
 
 
 class VideoReelService:
-    def __init__(self, session: Session):
+    def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create_video_reels(
@@ -29,6 +38,7 @@ class VideoReelService:
         reels_title: str = Form(...),
         video_reels: UploadFile = File(...),
         place: str = Form(None),
+        background_tasks: BackgroundTasks = None,
     ):
 
         if not video_reels.filename.endswith(".mp4"):
@@ -37,28 +47,106 @@ class VideoReelService:
                 detail="Unsupported file extension. Only .mp4 files are allowed.",
             )
 
-        file_size = await video_reels.read()
-        if len(file_size) <= 10:
-            raise HTTPException(
-                status_code=400, detail="File size must be greater than 10 bytes."
-            )
+        stored = await stream_upload_to_file(
+            video_reels,
+            directory=reels_store.scratch_dir,
+            filename=f".{uuid.uuid4()}.upload",
+            max_size=settings.reels_max_upload_bytes,
+            min_size=10,
+            accept=VIDEO_TYPES,
+        )
+        filename = await reels_store.put_file(
+            self.session,
+            os.path.join(reels_store.scratch_dir, stored.filename),
+            f"{stored.checksum}.mp4",
+            stored.size,
+        )
+
+        new_video_reels_obj = Reels(
+            reels_title=reels_title,
+            video_reels=filename,
+            checksum=stored.checksum,
+            hls_status="pending",
+            created_at=datetime.utcnow(),
+            user_id=current_user.id,
+            place=place if place else None,
+        )
+
+        self.session.add(new_video_reels_obj)
+        await self.session.commit()
+
+        if background_tasks is not None:
+            background_tasks.add_task(process_reels, new_video_reels_obj.id)
+
+        return {
+            "detail": "Video reel created successfully",
+            "reel": new_video_reels_obj,
+        }
+
+    async def create_upload_url(self, current_user: User) -> schema.ReelsUploadUrl:
+        """Pre-signed PUT so the client sends the video straight to storage."""
+        filename = f"{current_user.id}-{uuid.uuid4().hex}.mp4"
+        expires_in = settings.presigned_url_ttl_seconds
+
+        try:
+            upload_url = storage.presigned_put_url(reels_store.key(filename), expires_in)
+        except StorageError:
+            raise HTTPException(status_code=503, detail="Storage signing is not configured")
+
+        return schema.ReelsUploadUrl(
+            filename=filename,
+            upload_url=upload_url,
+            expires_in=expires_in,
+        )
+
+    async def create_video_reels_from_upload(
+        self,
+        current_user: User,
+        filename: str,
+        reels_title: str,
+        place: str = None,
+        background_tasks: BackgroundTasks = None,
+    ):
+        match = DIRECT_UPLOAD_NAME.match(filename)
+        if match is None or int(match.group(1)) != current_user.id:
+            raise HTTPException(status_code=403, detail="Upload does not belong to you.")
 
-        video_reels.filename = f"{uuid.uuid4()}.mp4"
+        if await self.session.scalar(select(Reels.id).filter(Reels.video_reels == filename)):
+            raise HTTPException(status_code=409, detail="Upload is already used by a reel.")
 
-        file_path = os.path.join(MEDIA_ROOT, video_reels.filename)
-        with open(file_path, "wb") as f:
-            f.write(file_size)
+        key = reels_store.key(filename)
+        size = await storage.size(key)
+        if size is None:
+            raise HTTPException(status_code=404, detail="Upload not found.")
+
+        # Клиент загружал файл напрямую, поэтому проверяем его здесь, как и при обычной загрузке
+        if size > settings.reels_max_upload_bytes:
+            await storage.delete(key)
+            raise HTTPException(
+                status_code=413,
+                detail=f"File is larger than {settings.reels_max_upload_bytes} bytes.",
+            )
+        if size <= 10:
+            await storage.delete(key)
+            raise HTTPException(status_code=400, detail="File size must be greater than 10 bytes.")
+        if sniff_media_type(await storage.read_range(key, 0, 15)) not in VIDEO_TYPES:
+            await storage.delete(key)
+            raise HTTPException(status_code=415, detail="Unsupported file type.")
 
         new_video_reels_obj = Reels(
             reels_title=reels_title,
-            video_reels=video_reels.filename,
+            video_reels=filename,
+            hls_status="pending",
             created_at=datetime.utcnow(),
             user_id=current_user.id,
             place=place if place else None,
         )
 
         self.session.add(new_video_reels_obj)
-        self.session.commit()
+        await self.session.commit()
+
+        if background_tasks is not None:
+            background_tasks.add_task(process_reels, new_video_reels_obj.id)
 
         return {
             "detail": "Video reel created successfully",
@@ -71,31 +159,21 @@ class VideoReelService:
         current_user: User,
     ) -> schema.VideoReelsSchema | None:
 
-        video_reels = (
-            self.session.query(Reels)
+        result = await self.session.execute(
+            select(Reels)
+            .options(
+                joinedload(Reels.user),
+                selectinload(Reels.who_viewed).joinedload(View.user),
+                selectinload(Reels.who_liked),
+            )
             .filter(Reels.id == id)
             .filter(or_(Reels.is_archived != True, Reels.is_archived == None))
-            .first()
         )
+        video_reels = result.scalars().first()
         if not video_reels:
             raise HTTPException(detail="Not FOUND", status_code=404)
 
-        existing_view = (
-            self.session.query(View)
-            .filter(View.reels_id == id, View.user_id == current_user.id)
-            .first()
-        )
-
-        if not existing_view:
-            new_view = View(
-                reels_id=id, user_id=current_user.id, viewed_at=datetime.utcnow()
-            )
-
-            self.session.add(new_view)
-            video_reels.view_count = (video_reels.view_count or 0) + 1
-
-            self.session.commit()
-            self.session.refresh(new_view)
+        view_buffer.record("reels", id, current_user.id)
 
         views_response = [
             schema.UserShema(
@@ -103,7 +181,7 @@ class VideoReelService:
                 username=str(video_reels.who_viewed.user.username),
                 profile_photo=str(video_reels.who_viewed.user.profile_photo),
             )
-        ]
+        ] if video_reels.who_viewed else []
 
         if video_reels.who_liked is None:
 
@@ -118,6 +196,7 @@ class VideoReelService:
 
         response = schema.VideoReelsSchema(
             id=video_reels.id,
+            **reels_media(video_reels),
             reels_title=video_reels.reels_title,
             video_reels=video_reels.video_reels,
             user=schema.UserShema(
@@ -129,7 +208,9 @@ class VideoReelService:
             created_at=video_reels.created_at,
             view_count=video_reels.view_count,
             views_for_detail_page=views_response,
-            like_count=len(video_reels.liked_by),
+            like_count=video_reels.like_count,
+            commentarion_count=video_reels.comment_count,
+            shered_count=video_reels.share_count,
             who_liked=who_liked_response,
             is_archived=video_reels.is_archived,
         )
@@ -140,12 +221,17 @@ class VideoReelService:
         self,
         current_user: User,
     ):
-        video_reels = (
-            self.session.query(Reels)
+        result = await self.session.execute(
+            select(Reels)
+            .options(
+                joinedload(Reels.user),
+                selectinload(Reels.who_viewed).joinedload(View.user),
+                selectinload(Reels.who_liked),
+            )
             .filter(or_(Reels.is_archived != True, Reels.is_archived == None))
             .order_by(Reels.created_at.desc())  
-            .all()
         )
+        video_reels = result.scalars().all()
 
         if not video_reels:
             raise HTTPException(detail="Not found", status_code=404)
@@ -173,6 +259,7 @@ class VideoReelService:
             response.append(
                 schema.VideoReelsSchema(
                     id=reels.id,
+                    **reels_media(reels),
                     reels_title=reels.reels_title,
                     video_reels=reels.video_reels,
                     user=schema.UserShema(
@@ -183,14 +270,12 @@ class VideoReelService:
                     place=reels.place,
                     created_at=reels.created_at,
                     view_count=reels.view_count,
-                    like_count=len(reels.liked_by),
+                    like_count=reels.like_count,
                     who_viewed=views_response,
                     who_liked=who_liked_response if who_liked_response else None,
-                    shered_count=len(reels.user_reels),
+                    shered_count=reels.share_count,
                     is_archived=reels.is_archived,
-                    commentarion_count=(
-                        len(reels.comments) if reels.comments is not None else None
-                    ),
+                    commentarion_count=reels.comment_count,
                 )
             )
 
@@ -203,15 +288,32 @@ class VideoReelService:
         current_user: User,
     ):
 
-        reels = self.session.query(Reels).filter(Reels.id == reels_id).first()
+        reels = await self.session.get(Reels, reels_id)
         if not reels:
             raise HTTPException(detail="Not Found", status_code=404)
 
-        if current_user not in reels.liked_by:
-            reels.liked_by.append(current_user)
+        # Счётчик меняем только по результату самих DELETE/INSERT
+        unliked = await self.session.scalar(
+            delete(models.reels_likes)
+            .filter(
+                models.reels_likes.c.reels_id == reels_id,
+                models.reels_likes.c.user_id == current_user.id,
+            )
+            .returning(models.reels_likes.c.user_id)
+        )
+
+        if unliked is None:
+            liked = await self.session.scalar(
+                insert(models.reels_likes)
+                .values(reels_id=reels_id, user_id=current_user.id)
+                .on_conflict_do_nothing()
+                .returning(models.reels_likes.c.user_id)
+            )
+            if liked is not None:
+                reels.like_count = Reels.like_count + 1
 
         else:
-            reels.liked_by.remove(current_user)
+            reels.like_count = Reels.like_count - 1
 
             notification = models.Notification(
             user_id=reels.user_id, 
@@ -222,9 +324,7 @@ class VideoReelService:
 
             self.session.add(notification)
 
-        self.session.commit()
-        self.session.refresh(current_user)
-        self.session.refresh(reels)
+        await self.session.commit()
 
         return {"message": {"detail": "Bro Likes was succsesfully"}}
 
@@ -234,34 +334,45 @@ class VideoReelService:
         current_user: User,
     ):
 
-        reels = (
-            self.session.query(Reels)
+        # Блокировка: обработка рилса может как раз заменять его видео
+        result = await self.session.execute(
+            select(Reels)
             .filter(Reels.id == reels_id)
             .filter(Reels.user_id == current_user.id)
-            .first()
+            .with_for_update()
         )
+        reels = result.scalars().first()
 
         if not reels:
             logger.info("User Error Or Reels error")
             raise HTTPException(detail="Not Found", status_code=404)
 
         try:
-            self.session.query(models.reels_likes).filter_by(reels_id=reels_id).delete()
-
-            file_path = os.path.join(MEDIA_ROOT, str(reels.video_reels))
-            os.remove(file_path)
+            await self.session.execute(
+                delete(models.reels_likes).filter(
+                    models.reels_likes.c.reels_id == reels_id
+                )
+            )
 
-            self.session.delete(reels)
-            self.session.commit()
+            await reels_store.release(self.session, reels.video_reels)
 
-            logger.info("Deleted Successfully")
-            return {"message": "Deleted Successfully"}
+            await self.session.delete(reels)
+            await self.session.commit()
 
         except Exception as e:
-            self.session.rollback()
+            await self.session.rollback()
             logger.error(f"Error occurred during deletion: {e}")
             raise HTTPException(status_code=500, detail="Internal Server Error")
 
+        # Рилс уже удалён: ошибка хранилища не должна превращать удаление в 500
+        try:
+            await storage.delete_prefix(hls_prefix(reels_id))
+        except Exception:
+            logger.exception("Failed to remove HLS renditions of reels %s", reels_id)
+
+        logger.info("Deleted Successfully")
+        return {"message": "Deleted Successfully"}
+
     async def update_video_reels(
         self,
         reels_id: int,
@@ -270,19 +381,19 @@ class VideoReelService:
         place: str = Form(None),
     ):
 
-        reels = (
-            self.session.query(Reels)
+        result = await self.session.execute(
+            select(Reels)
             .filter(Reels.id == reels_id)
             .filter(Reels.user_id == current_user.id)
-            .first()
         )
+        reels = result.scalars().first()
         if not reels:
             raise HTTPException(detail="Not Found", status_code=404)
 
         reels.reels_title = reels_title
         reels.place = place
 
-        self.session.commit()
+        await self.session.commit()
 
         return {"detail": "Updated Succsesfully"}
 
@@ -292,49 +403,52 @@ class VideoReelService:
         current_user: User,
     ):
 
-        video_reels = (
-            self.session.query(Reels)
+        result = await self.session.execute(
+            select(Reels)
             .filter(Reels.user_id == current_user.id)
             .filter(Reels.id == reels_id)
-            .first()
         )
+        video_reels = result.scalars().first()
         if not video_reels:
             raise HTTPException(detail="Not Found", status_code=404)
 
         if video_reels.is_archived == True:
             video_reels.is_archived = False
-            self.session.commit()
+            await self.session.commit()
             return "Added to archive succsesfully"
 
         else:
             video_reels.is_archived = True
-            self.session.commit()
+            await self.session.commit()
             return "removed succsesfully"
 
     async def get_user_liked_reels(
         self,
         current_user: User,
     ):
-        liked_reels_ids = (
-            self.session.query(models.reels_likes.c.reels_id)
-            .filter(models.reels_likes.c.user_id == current_user.id)
-            .all()
+        result = await self.session.execute(
+            select(models.reels_likes.c.reels_id).filter(
+                models.reels_likes.c.user_id == current_user.id
+            )
         )
+        liked_reels_ids = result.all()
 
         if not liked_reels_ids:
             return []
 
-        liked_reels = (
-            self.session.query(Reels)
+        result = await self.session.execute(
+            select(Reels)
+            .options(joinedload(Reels.user))
             .order_by(Reels.created_at.desc())
             .filter(Reels.id.in_([reels_id[0] for reels_id in liked_reels_ids]))
             .filter(or_(Reels.is_archived != True, Reels.is_archived == None))
-            .all()
         )
+        liked_reels = result.scalars().all()
 
         response = [
             schema.VideoReelsSchema(
                 id=reels.id,
+                **reels_media(reels),
                 video_reels=reels.video_reels,
                 reels_title=reels.reels_title,
                 user=schema.UserShema(
@@ -342,9 +456,9 @@ class VideoReelService:
                     username=str(reels.user.username),
                     profile_photo=str(reels.user.profile_photo),
                 ),
-                like_count=len(reels.liked_by),
+                like_count=reels.like_count,
                 view_count=reels.view_count,
-                shered_count=len(reels.user_reels),
+                shered_count=reels.share_count,
                 created_at=reels.created_at,
             )
             for reels in liked_reels
@@ -357,7 +471,16 @@ class VideoReelService:
         current_user: User,
     ) -> List[schema.VideoReelsSchema]:
 
-        top_reels = self.session.query(Reels).filter(Reels.view_count > 0).all()
+        result = await self.session.execute(
+            select(Reels)
+            .options(
+                joinedload(Reels.user),
+                selectinload(Reels.views).joinedload(View.user),
+                selectinload(Reels.liked_by),
+            )
+            .filter(Reels.view_count > 0)
+        )
+        top_reels = result.scalars().all()
         if not top_reels:
             raise HTTPException(detail="Not Found", status_code=404)
 
@@ -388,6 +511,7 @@ class VideoReelService:
             response.append(
                 schema.VideoReelsSchema(
                     id=reels.id,
+                    **reels_media(reels),
                     video_reels=reels.video_reels,
                     reels_title=reels.reels_title,
                     created_at=reels.created_at,
@@ -397,7 +521,7 @@ class VideoReelService:
                         profile_photo=str(reels.user.profile_photo),
                     ),
                     view_count=reels.view_count,
-                    like_count=len(reels.liked_by),
+                    like_count=reels.like_count,
                     views_for_detail_page=views,
                     who_liked=who_liked_response,
                 )
@@ -0,0 +1,138 @@
+from sqlalchemy import DateTime, Integer, column, update, select, func, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from database import models
+from database.database import SessionLocal
+from config.settings import settings
+from datetime import datetime, timezone
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+VIEW_TARGETS = {
+    "content": (models.View.content_id, models.Content, models.Content.view_count),
+    "reels": (models.View.reels_id, models.Reels, models.Reels.view_count),
+    "history": (models.View.history_id, models.History, models.History.views_count),
+}
+
+
+# Сбой соединения стоит повторить, остальные ошибки повторятся и в следующий раз
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, OSError)
+
+
+def register_views_statement(kind: str, rows: list[tuple[int, int, datetime]]):
+    """Insert (target_id, user_id, viewed_at) rows and bump the counters of new views.
+
+    Rows whose target or user has been deleted since the view was recorded are
+    skipped by joining the batch to both tables, so they cannot fail the batch
+    with a foreign key violation.
+    """
+    target_column, model, counter = VIEW_TARGETS[kind]
+
+    batch = values(
+        column("target_id", Integer),
+        column("user_id", Integer),
+        column("viewed_at", DateTime(timezone=True)),
+        name="batch",
+    ).data(rows)
+    existing = (
+        select(batch.c.target_id, batch.c.user_id, batch.c.viewed_at)
+        .join(model, model.id == batch.c.target_id)
+        .join(models.User, models.User.id == batch.c.user_id)
+    )
+
+    inserted = (
+        insert(models.View)
+        .from_select([target_column, models.View.user_id, models.View.viewed_at], existing)
+        .on_conflict_do_nothing()
+        .returning(target_column.label("target_id"))
+        .cte("inserted_views")
+    )
+    new_views = (
+        select(inserted.c.target_id, func.count().label("views"))
+        .group_by(inserted.c.target_id)
+        .subquery()
+    )
+
+    return (
+        update(model)
+        .where(model.id == new_views.c.target_id)
+        .values({counter: func.coalesce(counter, 0) + new_views.c.views})
+    )
+
+
+class ViewBuffer:
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: dict[tuple[str, int, int], datetime] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._flush_task: asyncio.Task | None = None
+
+    def record(self, target: str, target_id: int, user_id: int):
+        self._pending.setdefault(
+            (target, target_id, user_id), datetime.now(timezone.utc)
+        )
+
+        if len(self._pending) >= self.max_pending and (
+            self._flush_task is None or self._flush_task.done()
+        ):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, {}
+
+            try:
+                async with SessionLocal() as session:
+                    for target in VIEW_TARGETS:
+                        rows = [
+                            (target_id, user_id, viewed_at)
+                            for (kind, target_id, user_id), viewed_at in pending.items()
+                            if kind == target
+                        ]
+                        if rows:
+                            await session.execute(register_views_statement(target, rows))
+
+                    await session.commit()
+
+            except TRANSIENT_ERRORS:
+                logger.exception("Failed to flush %s buffered views, will retry", len(pending))
+                for key, viewed_at in pending.items():
+                    if len(self._pending) >= self.max_pending:
+                        break
+                    self._pending.setdefault(key, viewed_at)
+
+            except Exception:
+                logger.exception("Dropped %s buffered views", len(pending))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+
+view_buffer = ViewBuffer(
+    flush_interval=settings.view_flush_interval_seconds,
+    max_pending=settings.view_buffer_max_pending,
+)
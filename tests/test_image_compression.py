@@ -0,0 +1,54 @@
+from PIL import Image, ImageFilter
+from services.api.v1.image_compression import (
+    MAX_QUALITY,
+    MAX_RESIZE_ROUNDS,
+    QUALITY_STEP,
+    MIN_QUALITY,
+    TARGET_FILL,
+    compress_to_size,
+)
+import random
+import math
+import io
+import pytest
+
+
+# Один проход на исходное качество и бинарный поиск качества в каждом раунде
+MAX_PASSES = 1 + MAX_RESIZE_ROUNDS * math.ceil(
+    math.log2(len(range(MIN_QUALITY, MAX_QUALITY, QUALITY_STEP)) + 1)
+)
+
+
+def noise(width: int, height: int) -> Image.Image:
+    return Image.frombytes("RGB", (width, height), random.Random(0).randbytes(width * height * 3))
+
+
+def photo(width: int, height: int) -> Image.Image:
+    return noise(width // 8, height // 8).resize((width, height), Image.Resampling.BICUBIC).filter(
+        ImageFilter.GaussianBlur(2)
+    )
+
+
+def test_small_image_is_encoded_once():
+    compressed = compress_to_size(photo(320, 240), 500 * 1024)
+
+    assert compressed.passes == 1
+    assert compressed.quality == MAX_QUALITY
+    assert (compressed.width, compressed.height) == (320, 240)
+
+
+@pytest.mark.parametrize("image", [noise(4000, 3000), photo(4000, 3000)], ids=["noise", "photo"])
+@pytest.mark.parametrize("target_bytes", [50_000, 200_000])
+def test_result_uses_the_budget(image, target_bytes):
+    compressed = compress_to_size(image, target_bytes)
+
+    assert TARGET_FILL * target_bytes <= len(compressed.data) <= target_bytes
+    assert compressed.passes <= MAX_PASSES
+    with Image.open(io.BytesIO(compressed.data)) as decoded:
+        assert decoded.size == (compressed.width, compressed.height)
+
+
+def test_aspect_ratio_is_kept():
+    compressed = compress_to_size(noise(3000, 1000), 60_000)
+
+    assert compressed.width / compressed.height == pytest.approx(3, rel=0.01)
@@ -0,0 +1,159 @@
+from email.utils import formatdate
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+from services.api.v1.media_delivery import MediaFileResponse, _parse_range, media_file_response
+import asyncio
+import pytest
+import os
+
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / "clip.bin"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+@pytest.fixture
+def client(media):
+    app = FastAPI()
+
+    @app.get("/media")
+    async def serve(request: Request):
+        return await media_file_response(request, media, media_type="application/octet-stream")
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-9", (0, 9)),
+        ("bytes=10-", (10, 1023)),
+        ("bytes=-100", (924, 1023)),
+        ("bytes=-5000", (0, 1023)),
+        ("bytes=1000-5000", (1000, 1023)),
+        ("bytes=5-5", (5, 5)),
+        (" bytes = 0-1 ", (0, 1)),
+    ],
+)
+def test_parse_satisfiable_range(header, expected):
+    assert _parse_range(header, 1024) == expected
+
+
+@pytest.mark.parametrize(
+    "header",
+    ["bytes=5-3", "bytes=-", "bytes=a-b", "bytes=0-1,4-5", "items=0-1", "bytes=+1-2", "bytes=1-2-3"],
+)
+def test_invalid_range_is_ignored(header):
+    assert _parse_range(header, 1024) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=2000-3000", "bytes=-0"])
+def test_range_past_the_end_is_not_satisfiable(header):
+    with pytest.raises(HTTPException) as error:
+        _parse_range(header, 1024)
+
+    assert error.value.status_code == 416
+    assert error.value.headers == {"Content-Range": "bytes */1024"}
+
+
+def test_range_request(client):
+    response = client.get("/media", headers={"Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert response.content == DATA[10:20]
+
+
+def test_invalid_range_serves_the_whole_file(client):
+    response = client.get("/media", headers={"Range": "bytes=5-3"})
+
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+def test_unsatisfiable_range(client):
+    response = client.get("/media", headers={"Range": "bytes=4096-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+
+def test_etag_revalidation(client):
+    etag = client.get("/media").headers["etag"]
+
+    assert client.get("/media", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/media", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get("/media", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since(client, media):
+    mtime = os.stat(media).st_mtime
+
+    assert client.get("/media", headers={"If-Modified-Since": formatdate(mtime + 60, usegmt=True)}).status_code == 304
+    assert client.get("/media", headers={"If-Modified-Since": formatdate(mtime - 60, usegmt=True)}).status_code == 200
+    assert client.get("/media", headers={"If-Modified-Since": "not a date"}).status_code == 200
+
+
+def test_if_range_with_current_etag_returns_the_range(client):
+    etag = client.get("/media").headers["etag"]
+
+    response = client.get("/media", headers={"Range": "bytes=0-3", "If-Range": etag})
+
+    assert response.status_code == 206
+    assert response.content == DATA[:4]
+
+
+def test_if_range_with_stale_validator_returns_the_whole_file(client, media):
+    stale_date = formatdate(os.stat(media).st_mtime - 3600, usegmt=True)
+
+    for validator in ('"stale"', stale_date):
+        response = client.get("/media", headers={"Range": "bytes=0-3", "If-Range": validator})
+
+        assert response.status_code == 200
+        assert response.content == DATA
+
+
+def run_asgi(response: MediaFileResponse, extensions: dict) -> list[dict]:
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "headers": [], "extensions": extensions}
+    asyncio.run(response(scope, receive, send))
+    return messages
+
+
+def file_response(media: str, start: int, end: int) -> MediaFileResponse:
+    return MediaFileResponse(
+        media,
+        stat_result=os.stat(media),
+        start=start,
+        end=end,
+        status_code=206,
+        headers={"content-length": str(end - start + 1)},
+    )
+
+
+def test_zero_copy_send_is_used_when_the_server_offers_it(media):
+    messages = run_asgi(file_response(media, 100, 199), {"http.response.zerocopysend": {}})
+
+    zero_copy = messages[1]
+    assert zero_copy["type"] == "http.response.zerocopysend"
+    assert (zero_copy["offset"], zero_copy["count"]) == (100, 100)
+
+
+def test_range_falls_back_to_chunked_reads(media):
+    messages = run_asgi(file_response(media, 100, 199), {})
+
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    assert body == DATA[100:200]
+    assert messages[-1]["more_body"] is False
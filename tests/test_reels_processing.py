@@ -0,0 +1,97 @@
+from config.settings import settings
+from services.api.v1.reels_processing import package_hls, probe, rendition_ladder
+import subprocess
+import asyncio
+import shutil
+import pytest
+import re
+import os
+
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which(settings.ffmpeg_binary) is None or shutil.which(settings.ffprobe_binary) is None,
+    reason="ffmpeg is not installed",
+)
+
+
+def test_landscape_ladder_scales_height():
+    ladder = rendition_ladder(1920, 1080)
+
+    assert [(name, scale) for name, scale, _, _ in ladder] == [
+        ("240p", "-2:240"),
+        ("480p", "-2:480"),
+        ("720p", "-2:720"),
+    ]
+
+
+def test_portrait_ladder_scales_width():
+    ladder = rendition_ladder(1080, 1920)
+
+    assert [(name, scale) for name, scale, _, _ in ladder] == [
+        ("240p", "240:-2"),
+        ("480p", "480:-2"),
+        ("720p", "720:-2"),
+    ]
+
+
+def test_ladder_skips_renditions_above_the_short_side():
+    assert [name for name, _, _, _ in rendition_ladder(540, 960)] == ["240p", "480p"]
+
+
+def test_tiny_source_keeps_its_own_size():
+    assert [(name, scale) for name, scale, _, _ in rendition_ladder(160, 120)] == [("120p", "-2:120")]
+    assert [(name, scale) for name, scale, _, _ in rendition_ladder(75, 101)] == [("74p", "74:-2")]
+
+
+@requires_ffmpeg
+def test_portrait_source_keeps_its_resolution(tmp_path):
+    source = str(tmp_path / "portrait.mp4")
+    subprocess.run(
+        [
+            settings.ffmpeg_binary, "-v", "error",
+            "-f", "lavfi", "-i", "testsrc=size=540x960:rate=25",
+            "-t", "1", "-pix_fmt", "yuv420p", "-c:v", "libx264",
+            source,
+        ],
+        check=True,
+    )
+    output_dir = str(tmp_path / "hls")
+
+    async def package():
+        info = await probe(source)
+        await package_hls(source, info, output_dir)
+        return info
+
+    info = asyncio.run(package())
+
+    assert (info["width"], info["height"]) == (540, 960)
+    with open(os.path.join(output_dir, "master.m3u8")) as playlist:
+        resolutions = re.findall(r"RESOLUTION=(\d+)x(\d+)", playlist.read())
+    assert sorted((int(w), int(h)) for w, h in resolutions) == [(240, 426), (480, 854)]
+
+
+@requires_ffmpeg
+def test_probe_applies_display_rotation(tmp_path):
+    landscape = str(tmp_path / "landscape.mp4")
+    rotated = str(tmp_path / "rotated.mp4")
+    subprocess.run(
+        [
+            settings.ffmpeg_binary, "-v", "error",
+            "-f", "lavfi", "-i", "testsrc=size=640x360:rate=25",
+            "-t", "1", "-pix_fmt", "yuv420p", "-c:v", "libx264",
+            landscape,
+        ],
+        check=True,
+    )
+    subprocess.run(
+        [
+            settings.ffmpeg_binary, "-v", "error",
+            "-display_rotation", "90", "-i", landscape,
+            "-c", "copy", rotated,
+        ],
+        check=True,
+    )
+
+    info = asyncio.run(probe(rotated))
+
+    assert (info["width"], info["height"]) == (360, 640)